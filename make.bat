@@ -9,7 +9,10 @@ if "%TARGET%"=="" (
     echo   install           - Install dependencies from requirements.txt
     echo   init-db           - Initialize demo database
     echo   run               - Run Text-to-SQL demo query
+    echo   serve             - Start the HTTP service (warm chain)
+    echo   load-test         - Load-test a running service
     echo   benchmark-compare - Run benchmark on all providers
+    echo   index-advisor     - Suggest indexes for logged/benchmarked queries
     echo   clean             - Remove cache files and artifacts
     echo   help              - Show this help message
     goto :eof
@@ -33,12 +36,30 @@ if /I "%TARGET%"=="run" (
     goto :eof
 )
 
+if /I "%TARGET%"=="serve" (
+    echo Starting Text-to-SQL HTTP service...
+    python -m src.server --provider naive
+    goto :eof
+)
+
+if /I "%TARGET%"=="load-test" (
+    echo Load-testing the running service...
+    python -m scripts.load_test --requests 500 --concurrency 8
+    goto :eof
+)
+
 if /I "%TARGET%"=="benchmark-compare" (
     echo Running benchmark on all providers...
     python -m scripts.benchmark_compare eval\spider_sample.json --db data\demo_music.sqlite --providers naive openai ollama --output-md docs\benchmark_results.md --output-csv eval\results.csv
     goto :eof
 )
 
+if /I "%TARGET%"=="index-advisor" (
+    echo Suggesting indexes...
+    python -m scripts.index_advisor --db data\demo_music.sqlite --details benchmark_results\benchmark_details.json
+    goto :eof
+)
+
 if /I "%TARGET%"=="clean" (
     echo Cleaning cache and artifacts...
     for /r %%i in (__pycache__) do if exist "%%i" rmdir /s /q "%%i"
@@ -53,7 +74,10 @@ if /I "%TARGET%"=="help" (
     echo   install           - Install dependencies from requirements.txt
     echo   init-db           - Initialize demo database
     echo   run               - Run Text-to-SQL demo query
+    echo   serve             - Start the HTTP service (warm chain)
+    echo   load-test         - Load-test a running service
     echo   benchmark-compare - Run benchmark on all providers
+    echo   index-advisor     - Suggest indexes for logged/benchmarked queries
     echo   clean             - Remove cache files and artifacts
     echo   help              - Show this help message
     goto :eof
@@ -4,6 +4,7 @@ import json
 from typing import List, Dict
 from tabulate import tabulate
 from src.eval.benchmark import run_benchmark
+from src.eval.gold_cache import GoldCache, default_cache_path
 from src.providers import PROVIDERS
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -19,14 +20,30 @@ OLLAMA_MODELS = [
     "ollama-duckdb",
 ]
 
+# providers that are CPU-bound in-process; --processes runs these on a process pool
+CPU_BOUND_PROVIDERS = {"naive"}
+
+HEADERS = ["Provider", "EM", "EX", "Syntax Err", "Logic Err", "Exec Err", "Timeout", "Rejected", "Tok/s", "TTFT p50 ms", "Cost USD"]
+
+
+def _number(value, fmt):
+    return "-" if value is None else format(value, fmt)
+
+
 def provider_row(provider, m):
+    gen = m.get("generation_stats") or {}
     return [
         provider,
         f"{m['em']:.1%}",
         f"{m['ex']:.1%}",
         f"{m['syntax_error_rate']:.1%}",
         f"{m['logic_error_rate']:.1%}",
-        f"{m['execution_error_rate']:.1%}"
+        f"{m['execution_error_rate']:.1%}",
+        f"{m.get('timeout_error_rate', 0.0):.1%}",
+        f"{m.get('rejected_rate', 0.0):.1%}",
+        _number(gen.get("tokens_per_sec"), ".1f"),
+        _number(gen.get("ttft_ms_p50"), ".0f"),
+        _number(gen.get("cost_usd"), ".4f"),
     ]
 
 def error_metrics(provider_name, msg):
@@ -38,6 +55,8 @@ def error_metrics(provider_name, msg):
         "syntax_error_rate": 0.0,
         "logic_error_rate": 0.0,
         "execution_error_rate": 1.0,
+        "timeout_error_rate": 0.0,
+        "rejected_rate": 0.0,
         "results": [],
         "error": msg,
     }
@@ -48,10 +67,22 @@ if ROOT not in sys.path:
 
 from typing import Optional
 
-def run_multi_provider(dataset_path: str, default_db: str, providers: List[str], limit: Optional[int] = None) -> Dict:
-    """Run benchmarks across multiple providers and return aggregated results."""
+def run_multi_provider(
+    dataset_path: str,
+    default_db: str,
+    providers: List[str],
+    limit: Optional[int] = None,
+    workers: int = 1,
+    use_processes: bool = False,
+    gold_cache: Optional[GoldCache] = None,
+) -> Dict:
+    """Run benchmarks across multiple providers and return aggregated results.
+
+    Gold SQL is normalized and executed once for all providers via a shared GoldCache.
+    """
     import subprocess
     results = {}
+    gold_cache = gold_cache or GoldCache()
     openai_error = None
     ollama_model_map = {
         "ollama-phi3": "phi3:medium",
@@ -68,7 +99,10 @@ def run_multi_provider(dataset_path: str, default_db: str, providers: List[str],
             continue
         try:
             print(f"\nBenchmarking {provider_name}...")
-            metrics = run_benchmark(dataset_path, provider_name, default_db=default_db, limit=limit)
+            metrics = run_benchmark(
+                dataset_path, provider_name, default_db=default_db, limit=limit, workers=workers,
+                use_processes=use_processes and provider_name in CPU_BOUND_PROVIDERS, gold_cache=gold_cache,
+            )
             results[provider_name] = metrics
         except Exception as e:
             msg = str(e)
@@ -95,7 +129,7 @@ def print_console_table(results: Dict):
     if not results:
         print("No results.")
         return
-    headers = ["Provider", "EM", "EX", "Syntax Err", "Logic Err", "Exec Err"]
+    headers = HEADERS
     rows = []
     for provider, m in sorted(results.items()):
         rows.append(provider_row(provider, m))
@@ -105,20 +139,69 @@ def print_console_table(results: Dict):
         print(f"  Syntax Errors: {m['syntax_error_rate']:.1%}")
         print(f"  Logic Errors: {m['logic_error_rate']:.1%}")
         print(f"  Execution Errors: {m['execution_error_rate']:.1%}")
+        print(f"  Timeouts: {m.get('timeout_error_rate', 0.0):.1%}")
+        print(f"  Rejected by cost gate: {m.get('rejected_rate', 0.0):.1%}")
+        gen = m.get("generation_stats") or {}
+        if gen.get("calls"):
+            print(f"  Generation: {gen['calls']} calls, {gen['prompt_tokens']} prompt / {gen['completion_tokens']} completion tokens, "
+                  f"{_number(gen.get('tokens_per_sec'), '.1f')} tok/s, TTFT p50 {_number(gen.get('ttft_ms_p50'), '.0f')} ms, "
+                  f"cost ${_number(gen.get('cost_usd'), '.4f')}")
     print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
 
+STAGE_HEADERS = ["Provider", "Stage", "N", "p50 ms", "p95 ms", "p99 ms"]
+
+
+def stage_rows(results: Dict) -> List[List]:
+    rows = []
+    for provider, m in sorted(results.items()):
+        for stage, s in sorted(m.get("stage_latency", {}).items()):
+            rows.append([provider, stage, s["count"], f"{s['p50']:.1f}", f"{s['p95']:.1f}", f"{s['p99']:.1f}"])
+    return rows
+
+
+def print_stage_table(results: Dict):
+    rows = stage_rows(results)
+    if rows:
+        print("\nPer-stage latency:")
+        print(tabulate(rows, headers=STAGE_HEADERS, tablefmt="fancy_grid"))
+
+
+ROUTING_HEADERS = ["Provider", "Tier", "Calls", "Hit rate", "Errors", "p50 ms", "p95 ms"]
+
+
+def routing_rows(results: Dict) -> List[List]:
+    rows = []
+    for provider, m in sorted(results.items()):
+        for tier, s in m.get("routing", {}).items():
+            rows.append([provider, tier, s["calls"], f"{s['hit_rate']:.1%}", s["errors"], f"{s['p50_ms']:.1f}", f"{s['p95_ms']:.1f}"])
+    return rows
+
+
+def print_routing_table(results: Dict):
+    rows = routing_rows(results)
+    if rows:
+        print("\nRouting tiers:")
+        print(tabulate(rows, headers=ROUTING_HEADERS, tablefmt="fancy_grid"))
+
+
 def generate_markdown_table(results: Dict) -> str:
     if not results:
         return "No results."
-    headers = ["Provider", "EM", "EX", "Syntax Err", "Logic Err", "Exec Err"]
+    headers = HEADERS
     rows = [provider_row(provider, m) for provider, m in sorted(results.items())]
     table_md = tabulate(rows, headers=headers, tablefmt="github")
+    stages = stage_rows(results)
+    if stages:
+        table_md += "\n\n## Per-stage latency\n\n" + tabulate(stages, headers=STAGE_HEADERS, tablefmt="github")
+    routing = routing_rows(results)
+    if routing:
+        table_md += "\n\n## Routing tiers\n\n" + tabulate(routing, headers=ROUTING_HEADERS, tablefmt="github")
     return "# Benchmark Results\n\n" + table_md
 
 def generate_csv_table(results: Dict) -> str:
     if not results:
-        return "Provider,EM,EX,SyntaxErr,LogicErr,ExecErr"
-    lines = ["Provider,EM,EX,SyntaxErr,LogicErr,ExecErr"]
+        return "Provider,EM,EX,SyntaxErr,LogicErr,ExecErr,Timeout,Rejected,TokPerSec,TTFTp50Ms,CostUSD"
+    lines = ["Provider,EM,EX,SyntaxErr,LogicErr,ExecErr,Timeout,Rejected,TokPerSec,TTFTp50Ms,CostUSD"]
     for provider, m in sorted(results.items()):
         row = provider_row(provider, m)
         lines.append(",".join(str(x).replace('%','') if i>0 else str(x) for i,x in enumerate(row)))
@@ -129,9 +212,12 @@ def main():
     parser = argparse.ArgumentParser(description="Run multi-provider benchmarks and generate reports")
     parser.add_argument("dataset", help="Path to Spider-like JSON file")
     parser.add_argument("--db", dest="default_db", required=True, help="Default SQLite DB path")
-    parser.add_argument("--providers", nargs="+", default=["naive"], help="Providers to benchmark (naive|openai|ollama-qwen|ollama-phi3)")
+    parser.add_argument("--providers", nargs="+", default=["naive"], help="Providers to benchmark (naive|openai|ollama-qwen|ollama-phi3|router|router-openai)")
     parser.add_argument("--all-available", action="store_true", help="Run all available providers")
     parser.add_argument("--limit", type=int, default=None, help="Limit number of questions")
+    parser.add_argument("--workers", type=int, default=1, help="Questions in flight per provider (thread pool)")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool for CPU-bound providers (naive)")
+    parser.add_argument("--gold-cache", dest="gold_cache", action="store_true", help="Persist gold results next to the dataset and reuse them on later runs")
     parser.add_argument("--output-md", dest="output_md", help="Output Markdown file")
     parser.add_argument("--output-csv", dest="output_csv", help="Output CSV file")
     parser.add_argument("--output-json", dest="output_json", help="Output very detailed JSON file (all predictions, errors, etc)")
@@ -149,11 +235,18 @@ def main():
         providers = [p for p in (["naive", "openai"] + OLLAMA_MODELS) if PROVIDERS.get(p) is not None]
         print(f"Available providers: {providers}\n")
 
-    results = run_multi_provider(args.dataset, args.default_db, providers, limit=args.limit)
+    gold_cache = GoldCache(default_cache_path(args.dataset) if args.gold_cache else None)
+    results = run_multi_provider(
+        args.dataset, args.default_db, providers, limit=args.limit, workers=args.workers, use_processes=args.processes,
+        gold_cache=gold_cache,
+    )
+    gold_cache.save()
     md_table = generate_markdown_table(results)
     csv_table = generate_csv_table(results)
 
     print_console_table(results)
+    print_stage_table(results)
+    print_routing_table(results)
     out_dir = "benchmark_results"
     os.makedirs(out_dir, exist_ok=True)
     if args.output_md:
@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+from collections import Counter
+from contextlib import closing
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.request import pathname2url
+
+import sqlglot.expressions as exp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.db.sqlite_db import SQLiteDB  # noqa: E402
+from src.db.query_plan import analyze_plan, table_aliases  # noqa: E402
+from src.validation.sql_validator import parse_sql  # noqa: E402
+
+DB_PATH = os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite")
+# Stop adding indexes once the next one saves less than this share of the total cost
+MIN_BENEFIT = 0.01
+
+
+def feedback_queries(store) -> List[str]:
+    """SQL that was run for logged questions (the correction when there is one)."""
+    out = []
+    for entry in store.entries():
+        sql = entry["correction"] if entry["kind"] == "correction" else entry["sql"]
+        if sql:
+            out.append(sql)
+    return out
+
+
+def details_queries(path: str) -> List[str]:
+    """Predicted SQL from a benchmark details JSON ({provider: {results: [...]}}) or an
+    --output-json list of result items."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        items = [item for result in data.values() if isinstance(result, dict) for item in result.get("results", [])]
+    else:
+        items = data
+    return [item["pred_sql"] for item in items if isinstance(item, dict) and item.get("pred_sql")]
+
+
+def indexed_columns(conn: sqlite3.Connection, tables) -> Set[Tuple[str, str]]:
+    """(table, column) pairs that already lead an index or are the rowid alias."""
+    covered = set()
+    for t in tables:
+        for _, name, *_ in conn.execute(f'PRAGMA index_list("{t}");').fetchall():
+            info = conn.execute(f'PRAGMA index_info("{name}");').fetchall()
+            if info:
+                covered.add((t, info[0][2]))
+        for _, col, decl, _, _, pk in conn.execute(f'PRAGMA table_info("{t}");').fetchall():
+            if pk == 1 and decl.upper() == "INTEGER":
+                covered.add((t, col))
+    return covered
+
+
+def candidate_columns(ast: exp.Expression, tables: Dict[str, Set[str]]) -> Set[Tuple[str, str]]:
+    """(table, column) pairs used in joins, filters, GROUP BY or ORDER BY of one query."""
+    aliases = table_aliases(ast)
+    used = {aliases[a] for a in aliases if aliases[a] in tables}
+    nodes = []
+    for join in ast.find_all(exp.Join):
+        nodes.append(join.args.get("on"))
+    for kind in (exp.Where, exp.Group, exp.Order):
+        nodes.extend(ast.find_all(kind))
+    found = set()
+    for node in nodes:
+        if node is None:
+            continue
+        for col in node.find_all(exp.Column):
+            if col.table:
+                owners = [aliases.get(col.table, col.table)]
+            else:
+                owners = [t for t in used if col.name in tables[t]]
+            if len(owners) == 1 and col.name in tables.get(owners[0], ()):
+                found.add((owners[0], col.name))
+    return found
+
+
+def index_name(table: str, column: str) -> str:
+    return f"idx_{table}_{column}".lower()
+
+
+def create_index_sql(table: str, column: str) -> str:
+    return f'CREATE INDEX IF NOT EXISTS {index_name(table, column)} ON "{table}"("{column}");'
+
+
+class IndexAdvisor:
+    """Greedy index selection for a query workload, simulated on a copy of the database.
+
+    Each candidate index is created on the copy, every query that touches its table is
+    re-planned with EXPLAIN QUERY PLAN, and the candidate saving the most estimated rows
+    visited (weighted by how often the query occurs) is kept before the next round.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.schema = SQLiteDB(db_path).schema()
+        self.workload: Counter = Counter()
+        self.skipped = 0
+
+    def add_queries(self, queries: List[str]) -> None:
+        for sql in queries:
+            self.workload[" ".join(sql.split())] += 1
+
+    def _parsed(self) -> List[Tuple[str, int, exp.Expression]]:
+        out = []
+        for sql, n in self.workload.items():
+            try:
+                out.append((sql, n, parse_sql(sql)))
+            except Exception:
+                self.skipped += 1
+        return out
+
+    def _cost(self, conn: sqlite3.Connection, sql: str, ast: exp.Expression) -> Optional[float]:
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error:
+            return None
+        return analyze_plan(plan, self.schema.row_counts, table_aliases(ast)).cost
+
+    def advise(self, max_indexes: int = 5) -> Dict:
+        """Return baseline/final workload cost and the chosen [(table, column, saving)]."""
+        with tempfile.TemporaryDirectory() as tmp:
+            copy = sqlite3.connect(os.path.join(tmp, "advisor.sqlite"))
+            try:
+                uri = "file:" + pathname2url(os.path.abspath(self.db_path)) + "?mode=ro"
+                with closing(sqlite3.connect(uri, uri=True)) as src:
+                    src.backup(copy)
+                return self._advise(copy, max_indexes)
+            finally:
+                copy.close()
+
+    def _advise(self, conn: sqlite3.Connection, max_indexes: int) -> Dict:
+        queries, costs = [], {}
+        for sql, n, ast in self._parsed():
+            cost = self._cost(conn, sql, ast)
+            if cost is None:
+                self.skipped += 1
+                continue
+            queries.append((sql, n, ast, candidate_columns(ast, self.schema.tables)))
+            costs[sql] = cost
+        baseline = sum(costs[sql] * n for sql, n, _, _ in queries)
+        existing = indexed_columns(conn, self.schema.tables)
+        candidates = set().union(*(cols for *_, cols in queries)) - existing if queries else set()
+        chosen = []
+        while candidates and len(chosen) < max_indexes:
+            best = None
+            for table, column in sorted(candidates):
+                conn.execute(create_index_sql(table, column))
+                new_costs = {}
+                for sql, n, ast, cols in queries:
+                    if any(t == table for t, _ in cols):
+                        cost = self._cost(conn, sql, ast)
+                        if cost is not None:
+                            new_costs[sql] = cost
+                conn.execute(f"DROP INDEX {index_name(table, column)};")
+                saving = sum((costs[sql] - new_costs[sql]) * n for sql, n, _, _ in queries if sql in new_costs)
+                if best is None or saving > best[0]:
+                    best = (saving, table, column, new_costs)
+            saving, table, column, new_costs = best
+            if saving <= max(MIN_BENEFIT * baseline, 0.0):
+                break
+            conn.execute(create_index_sql(table, column))
+            costs.update(new_costs)
+            candidates.discard((table, column))
+            chosen.append((table, column, saving))
+        final = sum(costs[sql] * n for sql, n, _, _ in queries)
+        return dict(queries=len(queries), skipped=self.skipped, baseline_cost=baseline, final_cost=final, indexes=chosen)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Suggest indexes for the SQL actually run against a database")
+    parser.add_argument("--db", dest="db_path", default=DB_PATH, help="SQLite DB path")
+    parser.add_argument("--details", nargs="*", default=[], help="Benchmark details JSON files (benchmark_results/*.json)")
+    parser.add_argument("--no-feedback", dest="feedback", action="store_false", help="Do not read queries from the feedback store")
+    parser.add_argument("--max-indexes", dest="max_indexes", type=int, default=5, help="Maximum number of indexes to suggest")
+    parser.add_argument("--apply", action="store_true", help="Create the suggested indexes on --db")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(args.db_path)
+    if args.feedback:
+        from src.feedback import get_store
+        advisor.add_queries(feedback_queries(get_store()))
+    for path in args.details:
+        advisor.add_queries(details_queries(path))
+    if not advisor.workload:
+        print("No queries found (log feedback or pass --details).")
+        return
+    report = advisor.advise(args.max_indexes)
+    print(f"Analyzed {report['queries']} distinct queries ({report['skipped']} skipped: unparseable or not plannable)")
+    if not report["indexes"]:
+        print("No index lowers the estimated workload cost.")
+        return
+    saved = 1 - report["final_cost"] / report["baseline_cost"] if report["baseline_cost"] else 0.0
+    print(f"Estimated rows visited: {report['baseline_cost']:,.0f} -> {report['final_cost']:,.0f} ({saved:.1%} less)\n")
+    for table, column, saving in report["indexes"]:
+        print(f"{create_index_sql(table, column)}  -- saves ~{saving:,.0f}")
+    if args.apply:
+        # closing() closes the connection; the inner `with conn` commits the indexes
+        with closing(sqlite3.connect(args.db_path)) as conn, conn:
+            for table, column, _ in report["indexes"]:
+                conn.execute(create_index_sql(table, column))
+        print(f"\nApplied {len(report['indexes'])} indexes to {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
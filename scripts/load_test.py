@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.tracing import PERCENTILES, percentile  # noqa: E402
+
+DEFAULT_QUESTIONS = [
+    "How many tracks are there?",
+    "How many albums are there?",
+    "List top 5 albums by track count",
+    "Show tracks by artist The Example Band",
+]
+
+
+def post_query(url: str, question: str, provider: Optional[str], timeout: float) -> Tuple[int, float, Optional[str]]:
+    """(HTTP status, latency ms, error code) for one /query call; status 0 = connection failed."""
+    body = {"question": question}
+    if provider:
+        body["provider"] = provider
+    request = urllib.request.Request(
+        url.rstrip("/") + "/query", data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status, error = response.status, None
+    except urllib.error.HTTPError as e:
+        status = e.code
+        try:
+            error = json.loads(e.read() or b"{}").get("error")
+        except ValueError:
+            error = None
+    except (urllib.error.URLError, OSError) as e:
+        status, error = 0, type(e).__name__
+    return status, (time.perf_counter() - started) * 1000, error
+
+
+def load_test(url: str, questions: List[str], requests: int, concurrency: int, provider: Optional[str] = None, timeout: float = 60.0) -> Dict:
+    """Send `requests` /query calls, `concurrency` at a time, cycling through questions."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: post_query(url, questions[i % len(questions)], provider, timeout), range(requests)))
+    elapsed = time.perf_counter() - started
+    ok = sorted(ms for status, ms, _ in results if status == 200)
+    return dict(
+        requests=requests,
+        concurrency=concurrency,
+        seconds=round(elapsed, 3),
+        throughput_rps=round(requests / elapsed, 2) if elapsed else None,
+        statuses=dict(Counter(status for status, _, _ in results)),
+        errors=dict(Counter(error for _, _, error in results if error)),
+        latency_ms={f"p{p}": round(percentile(ok, p), 2) for p in PERCENTILES} if ok else {},
+    )
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Load-test a running src.server instance")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL")
+    parser.add_argument("--requests", type=int, default=200, help="Total /query requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--provider", help="Provider to ask for (default: the server's)")
+    parser.add_argument("--questions-file", dest="questions_file", help="One question per line (default: a few demo questions)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions_file:
+        with open(args.questions_file, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    report = load_test(args.url, questions, args.requests, args.concurrency, args.provider, args.timeout)
+    print(f"{report['requests']} requests, {report['concurrency']} concurrent, {report['seconds']} s "
+          f"-> {report['throughput_rps']} req/s")
+    print(f"Statuses: {report['statuses']}" + (f"  errors: {report['errors']}" if report["errors"] else ""))
+    if report["latency_ms"]:
+        print("Latency of 200s (ms): " + ", ".join(f"{k} {v}" for k, v in report["latency_ms"].items()))
+
+
+if __name__ == "__main__":
+    main()
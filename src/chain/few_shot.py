@@ -0,0 +1,164 @@
+import os
+import re
+import zlib
+import threading
+from typing import List, Dict, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+FEW_SHOT_K = int(os.environ.get("FEW_SHOT_K", 4))
+HASH_DIM = 1 << 12
+
+
+def features(text: str) -> List[int]:
+    """Hashed word unigrams plus character 3-grams of each word (crc32, stable across runs)."""
+    out = []
+    for word in re.findall(r"[a-z0-9_]+", text.lower()):
+        out.append(zlib.crc32(b"w:" + word.encode("utf-8")) % HASH_DIM)
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            out.append(zlib.crc32(b"c:" + padded[i:i + 3].encode("utf-8")) % HASH_DIM)
+    return out
+
+
+class FewShotIndex:
+    """Sparse hashed n-gram TF-IDF index over example questions.
+
+    Each example is stored as its non-zero (feature id, sublinear tf) pairs, appended
+    incrementally (static examples first, then feedback entries as they are logged).
+    The IDF-weighted, L2-normalized weights are rebuilt into per-feature posting lists
+    only after examples were added, so top_k touches just the rows that share a feature
+    with the question.
+    """
+
+    def __init__(self, examples: Optional[List[Dict[str, str]]] = None, feedback_store=None):
+        if np is None:
+            raise RuntimeError("FewShotIndex requires numpy")
+        self.examples: List[Dict[str, str]] = []
+        # COO layout: row, feature id and tf of every non-zero entry (ids fit 16 bits, so
+        # argsort can radix-sort them)
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._ids = np.zeros(0, dtype=np.uint16)
+        self._tf = np.zeros(0, dtype=np.float32)
+        self._df = np.zeros(HASH_DIM, dtype=np.float32)
+        self._idf = self._postings = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.feedback_store = feedback_store
+        self._last_feedback_id = 0
+        if examples:
+            self.add_many(examples)
+
+    def _sparse(self, text: str):
+        """(feature ids, sublinear tf) of text's non-zero features."""
+        ids, counts = np.unique(np.asarray(features(text), dtype=np.uint16), return_counts=True)
+        return ids, np.log1p(counts.astype(np.float32))
+
+    def add_many(self, examples: List[Dict[str, str]]) -> None:
+        if not examples:
+            return
+        parts = [self._sparse(ex["question"]) for ex in examples]
+        ids = np.concatenate([p[0] for p in parts])
+        tf = np.concatenate([p[1] for p in parts])
+        with self._lock:
+            n = len(self.examples)
+            rows = np.repeat(np.arange(n, n + len(parts), dtype=np.int32), [len(p[0]) for p in parts])
+            self._rows = np.concatenate((self._rows, rows))
+            self._ids = np.concatenate((self._ids, ids))
+            self._tf = np.concatenate((self._tf, tf))
+            self._df += np.bincount(ids, minlength=HASH_DIM)
+            self._postings = None  # n and df changed: reweight on the next query
+            self.examples.extend({"question": ex["question"], "sql": ex["sql"]} for ex in examples)
+
+    def add(self, question: str, sql: str) -> None:
+        self.add_many([{"question": question, "sql": sql}])
+
+    def refresh(self) -> None:
+        """Pull feedback entries logged since the last refresh (by any process)."""
+        if self.feedback_store is None:
+            return
+        with self._refresh_lock:
+            new = self.feedback_store.examples_since(self._last_feedback_id)
+            if new:
+                self._last_feedback_id = new[-1]["id"]
+                self.add_many(new)
+
+    def _reweight(self, n: int) -> None:
+        idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+        weights = self._tf * idf[self._ids]
+        norms = np.sqrt(np.bincount(self._rows, weights=weights * weights, minlength=n))
+        weights /= np.where(norms > 0, norms, 1.0)[self._rows]
+        order = np.argsort(self._ids, kind="stable")
+        # each row holds a feature at most once, so df is the posting-list length
+        starts = np.concatenate(([0], np.cumsum(self._df, dtype=np.int64)))
+        self._idf = idf
+        self._postings = (starts, self._rows[order], weights[order].astype(np.float32))
+
+    def _scores(self, question: str, n: int):
+        """Cosine similarity of question to every example."""
+        starts, rows, weights = self._postings
+        ids, tf = self._sparse(question)
+        if not len(ids):
+            return np.zeros(n)
+        q = tf * self._idf[ids]
+        q /= np.linalg.norm(q) or 1.0
+        spans = [slice(starts[i], starts[i + 1]) for i in ids]
+        return np.bincount(
+            np.concatenate([rows[s] for s in spans]),
+            weights=np.concatenate([weights[s] * w for s, w in zip(spans, q)]),
+            minlength=n,
+        )
+
+    @staticmethod
+    def _ranked(scores, m: int):
+        """Indices of (at least) the m best scores, best first; later entries win ties
+        (e.g. a correction of a static example)."""
+        n = len(scores)
+        cand = np.arange(n) if m >= n else np.flatnonzero(scores >= np.partition(scores, n - m)[n - m])
+        return cand[np.lexsort((-cand, -scores[cand]))]
+
+    def top_k(self, question: str, k: int = FEW_SHOT_K) -> List[Dict[str, str]]:
+        """The k examples most similar to question, least similar first so the closest
+        example sits right above the question in the prompt."""
+        self.refresh()
+        with self._lock:
+            n = len(self.examples)
+            if n == 0 or k <= 0:
+                return []
+            if self._postings is None:
+                self._reweight(n)
+            scores = self._scores(question, n)
+            # rank a few candidates per pick; all of them only if duplicate SQL ate those
+            for m in (4 * k, n):
+                order = self._ranked(scores, m)
+                picked, seen = [], set()
+                for i in order:
+                    sql = self.examples[i]["sql"]
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+                    picked.append(self.examples[i])
+                    if len(picked) == k:
+                        break
+                if len(picked) == k or len(order) == n:
+                    break
+        return picked[::-1]
+
+
+_default_index: Optional[FewShotIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index(static_examples: List[Dict[str, str]]) -> Optional[FewShotIndex]:
+    """Process-wide index over static examples + the feedback store; None without numpy."""
+    global _default_index
+    if np is None:
+        return None
+    with _default_lock:
+        if _default_index is None:
+            from src.feedback import get_store
+            _default_index = FewShotIndex(static_examples, feedback_store=get_store())
+        return _default_index
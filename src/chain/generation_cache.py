@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+
+GENERATION_CACHE_PATH = os.environ.get("GENERATION_CACHE_PATH", "data/generation_cache.sqlite")
+GENERATION_CACHE_SIZE = int(os.environ.get("GENERATION_CACHE_SIZE", 512))
+GENERATION_CACHE_TTL = float(os.environ.get("GENERATION_CACHE_TTL", 7 * 24 * 3600))
+
+
+def normalize_question(question: str) -> str:
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip(" ?.!")
+
+
+def schema_fingerprint(schema_context: str) -> str:
+    return hashlib.sha1(schema_context.encode("utf-8")).hexdigest()
+
+
+def cache_key(provider, question: str, schema_context: str) -> str:
+    """provider/model + normalized question + schema fingerprint."""
+    parts = (getattr(provider, "name", ""), getattr(provider, "model", "") or "", normalize_question(question), schema_fingerprint(schema_context))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """LRU + TTL cache of generated SQL, optionally backed by an on-disk SQLite store.
+
+    The in-memory LRU holds up to max_entries; the disk store keeps entries across
+    restarts until their TTL expires (and is trimmed to max_disk_entries).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = GENERATION_CACHE_PATH,
+        max_entries: int = GENERATION_CACHE_SIZE,
+        ttl: float = GENERATION_CACHE_TTL,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.path = path or None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries or max_entries * 20
+        self.hits = self.misses = 0
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.path:
+            try:
+                self._conn = self._open_store(self.path)
+            except Exception as e:
+                print(f"(Generation cache disabled on disk: {e})")
+
+    def _open_store(self, path: str) -> sqlite3.Connection:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("CREATE TABLE IF NOT EXISTS generation_cache (key TEXT PRIMARY KEY, sql TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL);")
+        conn.execute("CREATE INDEX IF NOT EXISTS generation_cache_used ON generation_cache(used);")
+        if self.ttl:
+            conn.execute("DELETE FROM generation_cache WHERE created < ?;", (time.time() - self.ttl,))
+        return conn
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl) and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute("SELECT sql, created FROM generation_cache WHERE key = ?;", (key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._mem.move_to_end(key)
+            if self._conn is not None:
+                self._conn.execute("UPDATE generation_cache SET used = ? WHERE key = ?;", (time.time(), key))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, sql: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, (sql, now))
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO generation_cache(key, sql, created, used) VALUES (?, ?, ?, ?);", (key, sql, now, now))
+                self._conn.execute(
+                    "DELETE FROM generation_cache WHERE key IN (SELECT key FROM generation_cache ORDER BY used DESC LIMIT -1 OFFSET ?);",
+                    (self.max_disk_entries,),
+                )
+
+    def invalidate(self, key: str) -> None:
+        """Drop an entry, e.g. when cached SQL no longer validates or executes."""
+        with self._lock:
+            self._discard(key)
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _discard(self, key: str) -> None:
+        self._mem.pop(key, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM generation_cache WHERE key = ?;", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM generation_cache;")
+            self.hits = self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return dict(hits=self.hits, misses=self.misses, hit_rate=round(self.hits / total, 4) if total else 0.0, entries=len(self._mem))
+
+
+_default_cache: Optional[GenerationCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> GenerationCache:
+    """Process-wide cache shared by every chain created with cache=True."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = GenerationCache()
+        return _default_cache
@@ -0,0 +1,105 @@
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple, Optional
+
+from src.db.sqlite_db import SQLiteDB, SchemaInfo
+
+# Schemas with at most this many tables are sent whole; larger ones are pruned
+SCHEMA_PRUNE_MIN_TABLES = int(os.environ.get("SCHEMA_PRUNE_MIN_TABLES", 8))
+SCHEMA_MAX_TABLES = int(os.environ.get("SCHEMA_MAX_TABLES", 6))
+SAMPLE_VALUES_PER_COLUMN = 50
+
+TABLE_WEIGHT = 3.0
+COLUMN_WEIGHT = 1.0
+VALUE_WEIGHT = 1.5
+
+
+def _stem(token: str) -> str:
+    for suffix in ("ies", "es", "s"):
+        if token.endswith(suffix) and len(token) > len(suffix) + 2:
+            return token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+
+def tokens(text: str) -> Set[str]:
+    """Lowercased, crudely stemmed word tokens; identifiers split on _ and camelCase."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text))
+    return {_stem(t) for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 1}
+
+
+class SchemaLinker:
+    """Lexical index from question tokens to tables, built once per schema version.
+
+    Table names, column names and sampled text values are tokenized up front; prune()
+    scores tables for a question and renders only the best ones plus their FK neighbours.
+    """
+
+    def __init__(self, schema: SchemaInfo, db: Optional[SQLiteDB] = None):
+        self.schema = schema
+        self.index: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for t, cols in schema.columns.items():
+            for tok in tokens(t):
+                self.index[tok][t] += TABLE_WEIGHT
+            for name, _ in cols:
+                for tok in tokens(name):
+                    self.index[tok][t] = max(self.index[tok][t], COLUMN_WEIGHT)
+        if db is not None:
+            self._index_values(db)
+
+    def _index_values(self, db: SQLiteDB) -> None:
+        # iter_rows() reads straight off a pooled cursor: these introspection queries must
+        # not take room in the result cache that user queries share
+        for t, cols in self.schema.columns.items():
+            for name, decl in cols:
+                if "CHAR" not in decl.upper() and "TEXT" not in decl.upper() and "CLOB" not in decl.upper():
+                    continue
+                sql = f'SELECT DISTINCT "{name}" FROM "{t}" WHERE typeof("{name}") = \'text\' LIMIT {SAMPLE_VALUES_PER_COLUMN};'
+                try:
+                    for (value,) in db.iter_rows(sql):
+                        for tok in tokens(value):
+                            if self.index[tok][t] < VALUE_WEIGHT:
+                                self.index[tok][t] = VALUE_WEIGHT
+                except Exception:
+                    continue
+
+    def score(self, question: str) -> List[Tuple[str, float]]:
+        scores: Dict[str, float] = defaultdict(float)
+        for tok in tokens(question):
+            for t, w in self.index.get(tok, {}).items():
+                scores[t] += w
+        return sorted(scores.items(), key=lambda kv: -kv[1])
+
+    def select(self, question: str, max_tables: int = SCHEMA_MAX_TABLES) -> List[str]:
+        """Best-scoring tables plus one hop of FK neighbours; every table if nothing matched."""
+        ranked = [t for t, _ in self.score(question)][:max_tables]
+        if not ranked:
+            return list(self.schema.names)
+        picked = set(ranked)
+        for t in ranked:
+            picked |= self.schema.fk_graph.get(t, set())
+        return [t for t in self.schema.names if t in picked]
+
+    def prune(self, question: str, max_tables: int = SCHEMA_MAX_TABLES) -> str:
+        if len(self.schema) <= SCHEMA_PRUNE_MIN_TABLES:
+            return self.schema.context
+        return self.schema.render(self.select(question, max_tables))
+
+
+_LINKERS: Dict[Tuple[str, Tuple], SchemaLinker] = {}
+_LINKERS_LOCK = threading.Lock()
+
+
+def get_linker(db: SQLiteDB, schema: SchemaInfo) -> SchemaLinker:
+    """Linker for this DB's current schema version (sample values are read once)."""
+    key = (os.path.abspath(db.path), schema.version)
+    with _LINKERS_LOCK:
+        linker = _LINKERS.get(key)
+    if linker is None:
+        linker = SchemaLinker(schema, db if len(schema) > SCHEMA_PRUNE_MIN_TABLES else None)
+        with _LINKERS_LOCK:
+            for stale in [k for k in _LINKERS if k[0] == key[0]]:
+                del _LINKERS[stale]
+            _LINKERS[key] = linker
+    return linker
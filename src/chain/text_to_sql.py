@@ -1,6 +1,31 @@
 import os
-from src.db.sqlite_db import SQLiteDB
-from src.validation.sql_validator import validate_sql
+import asyncio
+import threading
+import contextvars
+import weakref
+from collections import deque
+from contextlib import contextmanager
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from src.db.sqlite_db import SQLiteDB, DEFAULT_MAX_ROWS, QueryTimeout
+from src.db.result_cache import default_result_cache
+from src.db.query_plan import QueryTooExpensive, cost_gate
+from src.validation.sql_validator import parse_sql, validate_sql
+from src.chain.generation_cache import GenerationCache, cache_key, default_cache
+from src.chain.schema_linking import get_linker
+from src.providers.base import watch_cancel
+from src.tracing import TRACE_ENABLED, TRACE_PATH, current_trace, export_jsonl, span, trace
+
+# Finished traces a tracing chain keeps in memory (oldest dropped first)
+TRACE_KEEP = 10000
+# Hedged generation: delay before the next provider fires when no p95 is known yet (seconds),
+# samples needed before the observed p95 is trusted, and samples kept per provider
+HEDGE_DELAY = float(os.environ.get("HEDGE_DELAY", 2.0))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+HEDGE_WORKERS = 16
+
+PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY", 8))
 
 STATIC_FEW_SHOTS = [
     {"question": "How many tracks?", "sql": "SELECT COUNT(*) FROM tracks;"},
@@ -51,58 +76,559 @@ INSTRUCTIONS = (
     "\nCORRECT: SELECT * FROM tracks;"
 )
 
-def build_sql_prompt(schema, question):
-    """Build a complete prompt with schema, instructions, static and dynamic examples, and the question."""
-    lines = ["Schema:", schema, "", "Instructions:", INSTRUCTIONS, "", "Examples:"]
-    for ex in STATIC_FEW_SHOTS:
-        lines.append(f"Q: {ex['question']}")
-        lines.append(f"SQL: {ex['sql']}")
+def few_shot_examples(question, k=None):
+    """Top-k static + feedback examples by similarity to question (k defaults to FEW_SHOT_K).
+    Without numpy, falls back to every static example plus the 3 most recent feedback examples."""
+    # imported here: numpy is only needed once a prompt is built (not for naive/template answers)
+    from src.chain.few_shot import FEW_SHOT_K, default_index
+    k = FEW_SHOT_K if k is None else k
+    try:
+        index = default_index(STATIC_FEW_SHOTS)
+        if index is not None:
+            return index.top_k(question, k)
+    except Exception:
+        pass
+    examples = list(STATIC_FEW_SHOTS)
     try:
         from src.feedback import load_feedback_examples
-        for ex in load_feedback_examples(max_examples=3) or []:
-            lines.append(f"Q: {ex['question']}")
-            lines.append(f"SQL: {ex['sql']}")
+        examples += load_feedback_examples(max_examples=3) or []
     except Exception:
         pass
+    return examples
+
+
+def build_prompt_prefix(schema):
+    """Question-independent part of the prompt (schema + instructions). It is byte-identical
+    for every question on the same schema, so Ollama's KV cache and OpenAI prompt caching
+    can reuse it."""
+    return "\n".join(["Schema:", schema, "", "Instructions:", INSTRUCTIONS, ""])
+
+
+def build_prompt_suffix(question):
+    """Per-question part: the retrieved examples and the question itself."""
+    lines = ["Examples:"]
+    for ex in few_shot_examples(question):
+        lines.append(f"Q: {ex['question']}")
+        lines.append(f"SQL: {ex['sql']}")
     lines += ["", f"Question: {question}", "SQL:"]
     return "\n".join(lines)
 
+
+def build_sql_messages(schema, question):
+    """Chat messages with the stable prefix as the system message and the suffix as the user turn."""
+    with span("prompt"):
+        return [
+            {"role": "system", "content": build_prompt_prefix(schema)},
+            {"role": "user", "content": build_prompt_suffix(question)},
+        ]
+
+
+def build_sql_prompt(schema, question):
+    """Build a complete prompt with schema, instructions, the most relevant examples, and the question."""
+    with span("prompt"):
+        return build_prompt_prefix(schema) + "\n" + build_prompt_suffix(question)
+
+
+def _advance(steps, sql):
+    """Resume a _pipeline generator; returns (done, next request or final result)."""
+    try:
+        return False, steps.send(sql)
+    except StopIteration as done:
+        return True, done.value
+
+
+class _HedgeGroup:
+    """Stands in for the provider while a hedged run goes through the pipeline: cache
+    entries are keyed by the whole provider set and summaries come from the race winner
+    (the first provider when the SQL came from the cache). One group serves one run."""
+
+    model = None
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.name = "hedge:" + "+".join(p.name for p in providers)
+        self.winner = None
+
+    def summarize(self, question, rows):
+        return (self.winner or self.providers[0]).summarize(question, rows)
+
+
 class TextToSQLChain:
-    def __init__(self):
-        pass
+    def __init__(self, cache=True, result_cache=True, concurrency=None, max_plan_cost=None, trace=None):
+        """cache: True for the shared on-disk generation cache, False/None to disable,
+        or a GenerationCache instance. result_cache works the same way for query results
+        (the shared one is sized by SQL_RESULT_CACHE_BYTES). concurrency caps in-flight
+        arun() generations per provider: an int for all providers or a {name: limit}
+        dict (default PROVIDER_CONCURRENCY). max_plan_cost overrides SQL_PLAN_MAX_COST for
+        the EXPLAIN QUERY PLAN cost gate (0 disables it). trace records per-stage timings of
+        every request into self.traces (default TRACE_ENABLED; appended to TRACE_PATH if set)."""
+        if cache is True:
+            cache = default_cache()
+        if result_cache is True:
+            result_cache = default_result_cache()
+        self.cache: GenerationCache = cache or None
+        self.result_cache = result_cache or None
+        self.concurrency = PROVIDER_CONCURRENCY if concurrency is None else concurrency
+        self.max_plan_cost = max_plan_cost
+        self.trace = TRACE_ENABLED if trace is None else trace
+        self.traces = deque(maxlen=TRACE_KEEP)
+        self._latency = {}
+        self._hedge_pool = None
+        # event loop -> {provider name: semaphore}; entries go with their loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._providers = {}
+        self._providers_lock = threading.Lock()
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else dict(hits=0, misses=0, hit_rate=0.0, entries=0)
+
+    def _provider(self, provider_name):
+        """One provider instance per name for the life of the chain, so HTTP clients and
+        their connection pools are reused across questions."""
+        with self._providers_lock:
+            provider = self._providers.get(provider_name)
+            if provider is None:
+                from src.providers import PROVIDERS
+                ProviderCls = PROVIDERS.get(provider_name)
+                if not ProviderCls:
+                    raise RuntimeError(
+                        f"Provider '{provider_name}' not available. "
+                        "Possible fixes: check the provider name, install required dependencies, or check your .env configuration."
+                    )
+                provider = self._providers[provider_name] = ProviderCls()
+            return provider
+
+    def warm(self, provider_names=("naive",), db_path=None):
+        """Load the schema, schema linker, few-shot index and providers before the first
+        request, so a long-running process answers it at steady-state latency."""
+        db = SQLiteDB(db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite"), result_cache=self.result_cache)
+        schema = db.schema()
+        get_linker(db, schema)
+        few_shot_examples("warm up")
+        for name in provider_names:
+            self._provider(name)
+        return schema
+
+    def forget(self, question, provider, correction=None, db_path=None):
+        """Drop the cached SQL for question after a user rejected the answer, or cache their
+        correction in its place. provider is a name, or the provider names of a hedged run."""
+        if not self.cache:
+            return
+        try:
+            p = self._hedge_group(provider) if isinstance(provider, (list, tuple)) else self._provider(provider)
+        except Exception:
+            return  # not available here, so this chain never answered with it
+        db = SQLiteDB(db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite"), result_cache=self.result_cache)
+        key = cache_key(p, question, db.schema().context)
+        if correction:
+            self.cache.put(key, correction)
+        else:
+            self.cache.invalidate(key)
+
+    def provider_stats(self, provider_name):
+        """Running GenerationRecord totals (calls, tokens, timings, cost) for a provider used by this chain."""
+        provider = self._providers.get(provider_name)
+        return dict(getattr(provider, "stats_totals", None) or {})
+
+    def _observe(self, provider_name, seconds):
+        window = self._latency.get(provider_name)
+        if window is None:
+            window = self._latency.setdefault(provider_name, deque(maxlen=LATENCY_WINDOW))
+        window.append(seconds)
+
+    def latency_p95(self, provider_name):
+        """p95 generate_sql latency (seconds) seen by this chain, or None with too few samples."""
+        window = sorted(self._latency.get(provider_name, ()))
+        if len(window) < HEDGE_MIN_SAMPLES:
+            return None
+        return window[min(len(window) - 1, int(len(window) * 0.95))]
 
-    def run(self, question, provider_name="naive", db_path=None):
+    def _generate(self, provider, q, ctx, stage="generate"):
+        started = time.perf_counter()
+        with span(stage):
+            sql = provider.generate_sql(q, ctx)
+        self._observe(provider.name, time.perf_counter() - started)
+        return sql
+
+    async def _agenerate(self, provider, q, ctx, stage="generate", began=None):
+        async with self._semaphore(provider.name):
+            started = time.perf_counter()
+            if began is not None:
+                began.set_result(started)
+            with span(stage):
+                sql = await provider.agenerate_sql(q, ctx)
+        self._observe(provider.name, time.perf_counter() - started)
+        return sql
+
+    @contextmanager
+    def _traced(self, **attrs):
+        """Trace one request when tracing is on; inside an active trace, spans join it instead."""
+        if not self.trace or current_trace() is not None:
+            yield
+            return
+        t = None
+        try:
+            with trace(**attrs) as t:
+                yield
+        finally:
+            if t is not None:
+                self.traces.append(t)
+                if TRACE_PATH:
+                    export_jsonl([t], TRACE_PATH)
+
+    def _pipeline(self, question, provider, db_path, max_rows, count, timeout, max_steps):
+        """Generator holding the chain logic independently of how SQL is generated.
+
+        It yields (prompt question, schema context, check) whenever it needs the provider
+        and expects the generated SQL to be sent back; the final (sql, rows, summary) is
+        its return value. run() drives it synchronously, arun() with await. check(sql)
+        runs validation and the plan cost gate without executing, returning (ok, message);
+        hedged drivers use it to pick a winner, and its verdict is reused for the SQL sent back.
+        """
         qstr = question.strip().lower()
         vague = len(qstr.split()) < 4 or qstr in {"query", "search", "find", "show", "list", "get"} or any(x in qstr for x in ["something", "anything", "data", "info", "information", "details"])
 
-        from src.providers import PROVIDERS
-        db = SQLiteDB(db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite"))
-        schema_ctx = db.describe_schema()
-        tables = db.tables()
-        ProviderCls = PROVIDERS.get(provider_name)
-        if not ProviderCls:
-            raise RuntimeError(
-                f"Provider '{provider_name}' not available. "
-                "Possible fixes: check the provider name, install required dependencies, or check your .env configuration."
-            )
-        provider = ProviderCls()
-
-        last_error = None
+        db = SQLiteDB(db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite"), result_cache=self.result_cache)
+        with span("schema"):
+            schema = db.schema()
+        schema_ctx = schema.context
+        # the provider sees only the tables linked to the question; validation uses all of them
+        with span("link"):
+            prompt_ctx = get_linker(db, schema).prune(question)
+
+        key = cache_key(provider, question, schema_ctx) if self.cache else None
+        with span("cache"):
+            cached = self.cache.get(key) if key else None
+
+        checked = {}
+
+        def check(sql):
+            if sql not in checked:
+                checked[sql] = self._check(db, schema, sql, max_rows)
+            return checked[sql][:2]
+
+        last_error = last_exc = None
         for attempt in range(2):
-            q = question
-            if vague:
-                q += "\n# Clarify: Be specific and use concrete columns and values from the schema."
-            if attempt == 1 and last_error:
-                q += f"\n# Previous SQL was invalid: {last_error}. Please fix the SQL."
-            sql = provider.generate_sql(q, schema_ctx)
-            ok, msg = validate_sql(sql, tables)
+            if attempt == 0 and cached:
+                # cache hit: skip generation, but the SQL is still validated and executed
+                sql = cached
+            else:
+                q = question
+                if vague:
+                    q += "\n# Clarify: Be specific and use concrete columns and values from the schema."
+                if attempt == 1 and isinstance(last_exc, QueryTimeout):
+                    q += f"\n# Previous SQL was too expensive: {last_error}. Write a cheaper query: filter early, join on key columns and avoid cartesian products."
+                elif attempt == 1 and last_error:
+                    q += f"\n# Previous SQL was invalid: {last_error}. Please fix the SQL."
+                sql = yield q, prompt_ctx, check
+            ok, msg, verdict = checked.pop(sql, None) or self._check(db, schema, sql, max_rows)
             if ok:
                 try:
-                    db.explain(sql)
-                    rows = db.execute(sql)
-                    return sql, rows, provider.summarize(question, rows)
+                    # the cost gate's LIMIT only applies to this execution: the model's SQL is what
+                    # gets cached and returned. An auto-LIMITed query is too big to COUNT(*) in full
+                    with span("execute"):
+                        rows = db.fetch(
+                            verdict.sql, max_rows=max_rows, count=count and verdict.action == "run", timeout=timeout, max_steps=max_steps
+                        )
+                    rows.limited = verdict.action == "limit"
+                    if key and sql != cached:
+                        self.cache.put(key, sql)
+                    with span("summarize"):
+                        summary = provider.summarize(question, rows)
+                    return sql, rows, summary
                 except Exception as e:
-                    last_error = str(e)
+                    last_error, last_exc = str(e), e
             else:
-                last_error = msg
-        raise RuntimeError(f"validation_failed: {last_error}")
\ No newline at end of file
+                # verdict is the plan error (or QueryTooExpensive) when the cost gate failed
+                last_error, last_exc = msg, verdict if isinstance(verdict, Exception) else None
+            if attempt == 0 and cached:
+                self.cache.invalidate(key)
+        if isinstance(last_exc, QueryTimeout):
+            raise last_exc
+        raise RuntimeError(f"validation_failed: {last_error}")
+
+    def _check(self, db, schema, sql, max_rows):
+        """(ok, message, plan verdict or the exception that failed the check)."""
+        # parse_sql caches the AST, so the result-cache key and EM scoring reuse it;
+        # fetch() is the only time SQLite compiles the statement
+        with span("validate"):
+            ok, msg = validate_sql(sql, schema)
+        if not ok:
+            return False, msg, None
+        try:
+            with span("plan") as s:
+                verdict = cost_gate(db, sql, parse_sql(sql), schema, max_rows, max_cost=self.max_plan_cost)
+                s.set(action=verdict.action)
+        except Exception as e:
+            return False, str(e), e
+        if verdict.action == "reject":
+            return False, verdict.message, QueryTooExpensive(verdict.message)
+        return True, "ok", verdict
+
+    def run(self, question, provider_name="naive", db_path=None, max_rows=DEFAULT_MAX_ROWS, count=True, timeout=None, max_steps=None):
+        """Answer question and return (sql, rows, summary).
+
+        rows is a RowSet capped at max_rows; with count=True a truncated result also gets
+        its full size in rows.total so summaries stay accurate, unless the plan cost gate
+        had to add a LIMIT (rows.limited; total stays None). timeout/max_steps bound the
+        generated query (None uses SQL_QUERY_TIMEOUT/SQL_MAX_STEPS); if the last attempt
+        blew its budget, QueryTimeout is raised instead of a validation error
+        (QueryTooExpensive when the plan cost gate refused to run it).
+        """
+        return self._run_with(self._provider(provider_name), question, db_path, max_rows, count, timeout, max_steps)
+
+    def _run_with(self, provider, question, db_path=None, max_rows=DEFAULT_MAX_ROWS, count=True, timeout=None, max_steps=None):
+        with self._traced(question=question, provider=provider.name):
+            steps = self._pipeline(question, provider, db_path, max_rows, count, timeout, max_steps)
+            try:
+                done, value = _advance(steps, None)
+                while not done:
+                    done, value = _advance(steps, self._generate(provider, *value[:2]))
+                return value
+            finally:
+                steps.close()
+
+    def run_many(self, questions, provider_name="naive", db_path=None, workers=1, **kwargs):
+        """Answer a batch of questions with one provider instance (and its HTTP pool).
+
+        db_path is a single path or one path per question; kwargs go to run().
+        Yields (index, (sql, rows, summary), None) or (index, None, error) as each question
+        finishes, so with workers > 1 results arrive in completion order.
+        """
+        questions = list(questions)
+        db_paths = list(db_path) if isinstance(db_path, (list, tuple)) else [db_path] * len(questions)
+        try:
+            provider = self._provider(provider_name)
+        except Exception as e:
+            for i in range(len(questions)):
+                yield i, None, e
+            return
+
+        def answer(i):
+            try:
+                with self._traced(index=i, question=questions[i], provider=provider.name):
+                    return i, self._run_with(provider, questions[i], db_paths[i], **kwargs), None
+            except Exception as e:
+                return i, None, e
+
+        if workers <= 1:
+            for i in range(len(questions)):
+                yield answer(i)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for fut in as_completed([pool.submit(answer, i) for i in range(len(questions))]):
+                yield fut.result()
+
+    def _semaphore(self, provider_name):
+        loop = asyncio.get_running_loop()
+        with self._providers_lock:
+            sems = self._semaphores.get(loop)
+            if sems is None:
+                sems = self._semaphores[loop] = {}
+        sem = sems.get(provider_name)
+        if sem is None:
+            limit = self.concurrency.get(provider_name, PROVIDER_CONCURRENCY) if isinstance(self.concurrency, dict) else self.concurrency
+            sem = sems[provider_name] = asyncio.Semaphore(limit)
+        return sem
+
+    async def arun(self, question, provider_name="naive", db_path=None, max_rows=DEFAULT_MAX_ROWS, count=True, timeout=None, max_steps=None):
+        """Async run(): generation awaits provider.agenerate_sql under a per-provider
+        semaphore, and database work is pushed to the default executor so the event
+        loop stays free while many questions are in flight."""
+        loop = asyncio.get_running_loop()
+        provider = self._provider(provider_name)
+        with self._traced(question=question, provider=provider_name):
+            # executor threads don't inherit context vars; run each step in ours so spans land in the trace
+            ctx = contextvars.copy_context()
+            steps = self._pipeline(question, provider, db_path, max_rows, count, timeout, max_steps)
+            try:
+                done, value = await loop.run_in_executor(None, ctx.run, _advance, steps, None)
+                while not done:
+                    sql = await self._agenerate(provider, *value[:2])
+                    done, value = await loop.run_in_executor(None, ctx.run, _advance, steps, sql)
+                return value
+            finally:
+                try:
+                    steps.close()
+                except ValueError:
+                    pass  # cancelled while the executor was still resuming it
+
+    def _hedge_group(self, provider_names):
+        providers, errors = [], []
+        for name in provider_names:
+            try:
+                providers.append(self._provider(name))
+            except Exception as e:
+                errors.append(e)
+        if not providers:
+            raise errors[0] if errors else ValueError("no providers to hedge across")
+        return _HedgeGroup(providers)
+
+    def _hedge_wait(self, providers, launched, hedge_delay):
+        """Seconds to wait for a valid answer before the next provider fires."""
+        if hedge_delay == "p95":
+            p95 = self.latency_p95(providers[launched - 1].name)
+            return HEDGE_DELAY if p95 is None else p95
+        return float(hedge_delay)
+
+    def _race(self, providers, q, ctx, check, hedge_delay):
+        """(winning provider, sql): the first generated SQL that passes check().
+
+        With hedge_delay None every provider fires at once; otherwise the next one fires
+        only when no valid answer arrived within the delay after the previous provider
+        started running (not merely queued for a pool thread), or as soon as every running
+        provider has failed. Once a winner is picked, providers never fired are skipped,
+        queued ones are dropped and running ones are told to stop (streaming providers
+        check between chunks). If nothing passes, returns (None, last generated SQL) so
+        the pipeline reports and retries it.
+        """
+        with self._providers_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS)
+        pending, queue = {}, list(providers)
+        stop = threading.Event()
+        began = None  # resolves to the time the most recently fired provider started running
+        last_sql = last_exc = None
+
+        def generate(provider, started):
+            started.set_result(time.perf_counter())
+            watch_cancel(stop)
+            return self._generate(provider, q, ctx, f"hedge.{provider.name}")
+
+        def launch():
+            nonlocal began
+            provider, began = queue.pop(0), Future()
+            pending[self._hedge_pool.submit(contextvars.copy_context().run, generate, provider, began)] = provider
+
+        launch()
+        while queue and hedge_delay is None:
+            launch()
+        try:
+            while pending:
+                watch, delay = list(pending), None
+                if queue and began.done():
+                    waited = time.perf_counter() - began.result()
+                    delay = max(0.0, self._hedge_wait(providers, len(providers) - len(queue), hedge_delay) - waited)
+                elif queue:
+                    watch.append(began)  # its delay starts once a pool thread picks it up
+                done, _ = wait(watch, timeout=delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for fut in done:
+                    provider = pending.pop(fut, None)
+                    if provider is None:
+                        continue  # began resolved: the delay runs from now
+                    try:
+                        sql = fut.result()
+                    except Exception as e:
+                        last_exc = e
+                        continue
+                    if check(sql)[0]:
+                        return provider, sql
+                    last_sql = sql
+                if queue and not pending:
+                    launch()
+        finally:
+            stop.set()
+            for fut in pending:
+                fut.cancel()
+        if last_sql is None:
+            raise last_exc
+        return None, last_sql
+
+    async def _arace(self, providers, q, ctx, check, hedge_delay):
+        """Async _race(): losing generations are cancelled as soon as a winner is found.
+        Delays run from when the previous provider got past its concurrency semaphore."""
+        loop = asyncio.get_running_loop()
+        pending, queue = {}, list(providers)
+        began = None  # resolves to the time the most recently fired provider started running
+        last_sql = last_exc = None
+
+        def launch():
+            nonlocal began
+            provider, began = queue.pop(0), loop.create_future()
+            pending[asyncio.ensure_future(self._agenerate(provider, q, ctx, f"hedge.{provider.name}", began))] = provider
+
+        launch()
+        while queue and hedge_delay is None:
+            launch()
+        try:
+            while pending:
+                watch, delay = set(pending), None
+                if queue and began.done():
+                    waited = time.perf_counter() - began.result()
+                    delay = max(0.0, self._hedge_wait(providers, len(providers) - len(queue), hedge_delay) - waited)
+                elif queue:
+                    watch.add(began)  # its delay starts once it holds its semaphore
+                done, _ = await asyncio.wait(watch, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task, None)
+                    if provider is None:
+                        continue  # began resolved: the delay runs from now
+                    try:
+                        sql = task.result()
+                    except Exception as e:
+                        last_exc = e
+                        continue
+                    ok, _ = await loop.run_in_executor(None, contextvars.copy_context().run, check, sql)
+                    if ok:
+                        return provider, sql
+                    last_sql = sql
+                if queue and not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        if last_sql is None:
+            raise last_exc
+        return None, last_sql
+
+    def run_hedged(self, question, provider_names, db_path=None, hedge_delay=None, max_rows=DEFAULT_MAX_ROWS, count=True, timeout=None, max_steps=None):
+        """run() racing several providers; the first SQL that passes validation and the plan
+        cost gate is executed. Unavailable providers are skipped.
+
+        hedge_delay None fires all providers at once; a number of seconds, or "p95" (the
+        previous provider's observed p95 latency, HEDGE_DELAY until enough samples), holds
+        each further provider back until the ones before it are that late.
+
+        Returns (sql, rows, summary, provider): the name of the provider whose SQL was used,
+        or the group's "hedge:..." name when it came from the generation cache.
+        """
+        group = self._hedge_group(provider_names)
+        with self._traced(question=question, provider=group.name):
+            steps = self._pipeline(question, group, db_path, max_rows, count, timeout, max_steps)
+            try:
+                done, value = _advance(steps, None)
+                while not done:
+                    with span("generate") as s:
+                        group.winner, sql = self._race(group.providers, *value, hedge_delay)
+                        s.set(winner=group.winner.name if group.winner else None)
+                    done, value = _advance(steps, sql)
+                return value + ((group.winner or group).name,)
+            finally:
+                steps.close()
+
+    async def arun_hedged(self, question, provider_names, db_path=None, hedge_delay=None, max_rows=DEFAULT_MAX_ROWS, count=True, timeout=None, max_steps=None):
+        """Async run_hedged(); generations run under each provider's semaphore."""
+        loop = asyncio.get_running_loop()
+        group = self._hedge_group(provider_names)
+        with self._traced(question=question, provider=group.name):
+            ctx = contextvars.copy_context()
+            steps = self._pipeline(question, group, db_path, max_rows, count, timeout, max_steps)
+            try:
+                done, value = await loop.run_in_executor(None, ctx.run, _advance, steps, None)
+                while not done:
+                    with span("generate") as s:
+                        group.winner, sql = await self._arace(group.providers, *value, hedge_delay)
+                        s.set(winner=group.winner.name if group.winner else None)
+                    done, value = await loop.run_in_executor(None, ctx.run, _advance, steps, sql)
+                return value + ((group.winner or group).name,)
+            finally:
+                try:
+                    steps.close()
+                except ValueError:
+                    pass
@@ -1,70 +1,280 @@
 import os
 import argparse
-from tabulate import tabulate
-from dotenv import load_dotenv
 
-from src.chain.text_to_sql import TextToSQLChain
-from src.feedback import log_feedback
+# tabulate, the chain (sqlglot) and the feedback store are imported after argument parsing;
+# provider client libraries only when that provider is used. src modules read their settings
+# at import, so none is imported before main() has loaded .env
 
-def main():
-    parser = argparse.ArgumentParser(description="Text-To-SQL CLI")
-    parser.add_argument("question", help="NLP question to answer")
-    parser.add_argument("--provider", default="naive", help="Provider: naive|openai|ollama-qwen|ollama-phi3")
-    parser.add_argument("--db-path", dest="db_path", help="SQLite DB path")
-    parser.add_argument("--show-rows", dest="show_rows", action="store_true", help="Show result rows")
-    parser.add_argument("--no-show-rows", dest="show_rows", action="store_false", help="Hide result rows")
-    parser.set_defaults(show_rows=True)
-    parser.add_argument("--limit", type=int, default=10, help="Row display limit")
-    parser.add_argument("--thumbs-up", dest="thumbs", action="store_const", const="up", help="Mark helpful")
-    parser.add_argument("--thumbs-down", dest="thumbs", action="store_const", const="down", help="Mark not helpful")
-    parser.add_argument("--correction", help="User-corrected SQL to execute and log")
-    args = parser.parse_args()
+REPL_HELP = """Commands:
+  :feedback up|down   rate the last answer
+  :correct <SQL>      run corrected SQL for the last question and log it
+  :provider <name>    switch provider
+  :help               show this help
+  :quit               leave (also Ctrl-D)
+Anything else is answered as a question."""
+
+def print_error(msg, args):
+    if "not available" in msg and "provider" in msg:
+        print(f"Error: Provider '{args.provider}' is not available.\nPossible fixes: check the provider name, install required dependencies, or check your .env configuration.")
+    elif "no such table" in msg or "unable to open database file" in msg or "no such file or directory" in msg:
+        print(f"Error: Database path is invalid or missing.\nPossible fixes: check --db-path, run 'make init-db', or verify the database file exists.")
+    elif "query_timeout" in msg:
+        print(f"Error: Query exceeded its execution budget ({msg.split(':',1)[-1].strip()}).\nTry a narrower question or raise --timeout/--max-steps.")
+    elif "validation_failed" in msg:
+        print(f"Error: SQL validation failed.\nDetails: {msg.split(':',1)[-1].strip()}\nTry rephrasing your question or check the schema.")
+    else:
+        print(f"Error: {msg}")
 
-    load_dotenv()
-    chain = TextToSQLChain()
-    sql = rows = summary = None
-    try:
-        sql, rows, summary = chain.run(args.question, provider_name=args.provider, db_path=args.db_path)
-        # if user provided correction, run that instead
-        if args.correction:
-            from src.db.sqlite_db import SQLiteDB
-            dbp = args.db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite")
-            db = SQLiteDB(dbp)
-            rows = db.execute(args.correction)
-            sql = args.correction
-            summary = f"User-corrected SQL executed. {len(rows)} rows."
-    except Exception as e:
-        msg = str(e)
-        if "not available" in msg and "provider" in msg:
-            print(f"Error: Provider '{args.provider}' is not available.\nPossible fixes: check the provider name, install required dependencies, or check your .env configuration.")
-        elif "no such table" in msg or "unable to open database file" in msg or "no such file or directory" in msg:
-            print(f"Error: Database path is invalid or missing.\nPossible fixes: check --db-path, run 'make init-db', or verify the database file exists.")
-        elif "validation_failed" in msg:
-            print(f"Error: SQL validation failed.\nDetails: {msg.split(':',1)[-1].strip()}\nTry rephrasing your question or check the schema.")
-        else:
-            print(f"Error: {msg}")
-        return
 
+def print_result(sql, rows, summary, args):
+    from tabulate import tabulate
+    from src.providers.base import count_text
     print(f"\nSQL:\n{sql}")
     if args.show_rows:
         if rows:
             print("\nResults:")
-            print(tabulate(rows[:args.limit]))
+            print(tabulate(rows))
+            if rows.truncated:
+                print(f"(showing first {len(rows)} of {count_text(rows)} rows)")
+            if rows.limited:
+                print("(the plan cost gate added a LIMIT to this query, so its full size was not computed)")
         else:
             print("No rows returned")
     print(f"\nSummary:\n{summary}")
+
+
+def print_prompt_stats(stats):
+    from tabulate import tabulate
+    if not stats:
+        print("\n(No generation stats reported by this provider)")
+        return
+    print("\nGeneration stats:")
+    print(tabulate([(k, round(v, 1) if isinstance(v, float) else v) for k, v in stats.items()]))
+
+
+def print_timings(t):
+    from tabulate import tabulate
+    print(f"\nTimings ({t.wall_ms:.1f} ms total):")
+    print(tabulate([(name, f"{offset:.1f}", f"{ms:.1f}") for name, offset, ms, _ in sorted(t.spans, key=lambda s: s[1])], headers=["Stage", "Start ms", "ms"]))
+
+
+def print_stage_percentiles(traces):
+    from tabulate import tabulate
+    from src.tracing import stage_percentiles
+    stats = stage_percentiles(dict(t.stage_ms(), total=t.wall_ms) for t in traces)
+    print("\nPer-stage latency (ms):")
+    print(tabulate(
+        [(name, s["count"], s["p50"], s["p95"], s["p99"]) for name, s in sorted(stats.items())],
+        headers=["Stage", "N", "p50", "p95", "p99"],
+    ))
+
+
+def hedge_delay(value):
+    return value if value in (None, "p95") else float(value)
+
+
+def answer_question(chain, args):
+    """(sql, rows, summary, provider that answered: the race winner with --hedge)."""
+    provider = args.provider
+    if args.hedge:
+        sql, rows, summary, provider = chain.run_hedged(
+            args.question, args.hedge, db_path=args.db_path, hedge_delay=hedge_delay(args.hedge_delay),
+            max_rows=args.limit, timeout=args.timeout, max_steps=args.max_steps,
+        )
+    else:
+        sql, rows, summary = chain.run(
+            args.question, provider_name=args.provider, db_path=args.db_path, max_rows=args.limit,
+            timeout=args.timeout, max_steps=args.max_steps,
+        )
+    # if user provided correction, run that instead
+    if args.correction:
+        sql, rows, summary = run_correction(args.correction, args)
+    return sql, rows, summary, provider
+
+
+def run_correction(sql, args):
+    """Execute user-corrected SQL; returns (sql, rows, summary) like a chain answer."""
+    from src.db.sqlite_db import SQLiteDB
+    from src.providers.base import row_count
+    from src.tracing import span
+    dbp = args.db_path or os.environ.get("SQLITE_DB_PATH", "data/demo_music.sqlite")
+    db = SQLiteDB(dbp, timeout=args.timeout, max_steps=args.max_steps)
+    with span("correction"):
+        rows = db.fetch(sql, max_rows=args.limit, count=True)
+    return sql, rows, f"User-corrected SQL executed. {row_count(rows)} rows."
+
+
+def timing_line(t, top=4):
+    """Total time and the slowest stages of one traced answer, on one line."""
+    stages = sorted(t.stage_ms().items(), key=lambda kv: -kv[1])[:top]
+    return f"({t.wall_ms:.1f} ms; " + ", ".join(f"{name} {ms:.1f}" for name, ms in stages) + ")"
+
+
+def log_answer(chain, question, args, sql, rows, summary, provider=None, feedback=None, correction=None):
+    """Log feedback; a thumbs-down or correction also stops the cache serving the rejected SQL."""
+    from src.feedback import log_feedback
+    from src.providers.base import row_count
     try:
         log_feedback(
-            question=args.question,
-            provider=args.provider,
+            question=question,
+            provider=provider or args.provider,
             sql=sql,
-            rows=len(rows) if rows else 0,
+            rows=row_count(rows) if rows else 0,
             summary=summary,
-            feedback=args.thumbs,
-            correction=args.correction,
+            feedback=feedback,
+            correction=correction,
         )
     except Exception as e:
         print(f"(Could not log feedback: {e})")
+    if feedback == "down" or correction:
+        try:
+            chain.forget(question, args.hedge or args.provider, correction=correction, db_path=args.db_path)
+        except Exception as e:
+            print(f"(Could not update the generation cache: {e})")
+
+
+def repl(chain, args):
+    """Answer questions interactively. The chain (schema, linker, provider instance and
+    SQLite connection) stays loaded for the whole session."""
+    from src.tracing import export_jsonl, trace
+    try:
+        import readline  # noqa: F401  line editing and history for input()
+    except ImportError:
+        pass
+    print(f"Text-to-SQL REPL (provider {args.provider}). Type :help for commands, :quit to exit.")
+    last = None  # (question, sql, rows, summary, provider) of the last answer
+    while True:
+        try:
+            line = input("t2s> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if not line:
+            continue
+        if line.startswith(":"):
+            cmd, _, rest = line[1:].partition(" ")
+            rest = rest.strip()
+            if cmd in ("q", "quit", "exit"):
+                return
+            if cmd == "help":
+                print(REPL_HELP)
+            elif cmd == "provider" and rest:
+                args.provider = rest
+                print(f"Provider: {rest}")
+            elif cmd in ("feedback", "correct") and last is None:
+                print("Ask a question first.")
+            elif cmd == "feedback" and rest in ("up", "down"):
+                log_answer(chain, last[0], args, *last[1:4], provider=last[4], feedback=rest)
+                print(f"Logged thumbs-{rest}.")
+            elif cmd == "correct" and rest:
+                with trace(question=last[0], provider=args.provider) as t:
+                    try:
+                        answer = run_correction(rest, args)
+                    except Exception as e:
+                        print_error(str(e), args)
+                        continue
+                print_result(*answer, args)
+                print(timing_line(t))
+                log_answer(chain, last[0], args, *answer, provider=last[4], correction=rest)
+                last = (last[0],) + answer + (last[4],)
+            else:
+                print(f"Unknown or incomplete command: {line} (try :help)")
+            continue
+        args.question, args.correction = line, None
+        with trace(question=line, provider=args.provider) as t:
+            try:
+                sql, rows, summary, provider = answer_question(chain, args)
+            except Exception as e:
+                print_error(str(e), args)
+                continue
+        if args.trace_out:
+            export_jsonl([t], args.trace_out)
+        print_result(sql, rows, summary, args)
+        print(timing_line(t))
+        last = (line, sql, rows, summary, provider)
+
+
+def read_questions(path):
+    """One question per line; blank lines and # comments are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_questions_file(chain, args):
+    from src.tracing import export_jsonl
+    questions = read_questions(args.questions_file)
+    batch = chain.run_many(
+        questions, provider_name=args.provider, db_path=args.db_path, workers=args.workers,
+        max_rows=args.limit, timeout=args.timeout, max_steps=args.max_steps,
+    )
+    for i, answer, exc in batch:
+        print(f"\n=== [{i + 1}/{len(questions)}] {questions[i]}")
+        if exc is not None:
+            print_error(str(exc), args)
+        else:
+            print_result(*answer, args)
+    if args.prompt_stats:
+        print_prompt_stats(chain.provider_stats(args.provider))
+    if args.timings:
+        print_stage_percentiles(chain.traces)
+    if args.trace_out:
+        export_jsonl(chain.traces, args.trace_out)
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Text-To-SQL CLI")
+    parser.add_argument("question", nargs="?", help="NLP question to answer")
+    parser.add_argument("--repl", action="store_true", help="Interactive session: ask many questions with one warm chain")
+    parser.add_argument("--questions-file", dest="questions_file", help="Answer every question in this file (one per line) in one batch")
+    parser.add_argument("--workers", type=int, default=1, help="Questions in flight with --questions-file")
+    parser.add_argument("--provider", default="naive", help="Provider: naive|openai|ollama-qwen|ollama-phi3")
+    parser.add_argument("--hedge", nargs="+", metavar="PROVIDER", help="Race these providers; the first valid SQL wins")
+    parser.add_argument("--hedge-delay", dest="hedge_delay", help="With --hedge: seconds (or 'p95') before each further provider fires")
+    parser.add_argument("--db-path", dest="db_path", help="SQLite DB path")
+    parser.add_argument("--show-rows", dest="show_rows", action="store_true", help="Show result rows")
+    parser.add_argument("--no-show-rows", dest="show_rows", action="store_false", help="Hide result rows")
+    parser.set_defaults(show_rows=True)
+    parser.add_argument("--limit", type=int, default=10, help="Row display limit (rows beyond it are never fetched)")
+    parser.add_argument("--timeout", type=float, default=None, help="Query time budget in seconds (0 disables; default SQL_QUERY_TIMEOUT)")
+    parser.add_argument("--max-steps", dest="max_steps", type=int, default=None, help="Query VM-step budget (0 disables; default SQL_MAX_STEPS)")
+    parser.add_argument("--prompt-stats", dest="prompt_stats", action="store_true", help="Print provider prompt-cache/prefill stats")
+    parser.add_argument("--timings", action="store_true", help="Print per-stage latency (schema, generate, validate, execute, ...)")
+    parser.add_argument("--trace-out", dest="trace_out", help="Append per-stage spans to this JSONL file")
+    parser.add_argument("--thumbs-up", dest="thumbs", action="store_const", const="up", help="Mark helpful")
+    parser.add_argument("--thumbs-down", dest="thumbs", action="store_const", const="down", help="Mark not helpful")
+    parser.add_argument("--correction", help="User-corrected SQL to execute and log")
+    args = parser.parse_args()
+    if not args.question and not args.questions_file and not args.repl:
+        parser.error("a question, --questions-file or --repl is required")
+
+    from src.chain.text_to_sql import TextToSQLChain
+    from src.tracing import export_jsonl, trace
+    traced = args.timings or bool(args.trace_out)
+    chain = TextToSQLChain(trace=traced or None)
+    if args.repl:
+        repl(chain, args)
+        return
+    if args.questions_file:
+        run_questions_file(chain, args)
+        return
+    sql = rows = summary = None
+    with trace(question=args.question, provider=args.provider) as t:
+        try:
+            sql, rows, summary, provider = answer_question(chain, args)
+        except Exception as e:
+            print_error(str(e), args)
+            return
+    if args.trace_out:
+        export_jsonl([t], args.trace_out)
+
+    print_result(sql, rows, summary, args)
+    if args.timings:
+        print_timings(t)
+    if args.prompt_stats:
+        print_prompt_stats(chain.provider_stats(args.provider))
+    log_answer(chain, args.question, args, sql, rows, summary, provider=provider, feedback=args.thumbs, correction=args.correction)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import os
+import re
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import sqlglot.expressions as exp
+
+from src.db.sqlite_db import SQLiteDB, SchemaInfo, QueryTimeout
+
+# Estimated rows visited above which generated SQL is not run as-is (0 disables the gate)
+PLAN_MAX_COST = float(os.environ.get("SQL_PLAN_MAX_COST", 5e7))
+# "limit": over-budget streaming plans get a LIMIT, blocking ones are rejected; "reject": reject all
+PLAN_POLICY = os.environ.get("SQL_PLAN_POLICY", "limit")
+# Full scans of tables at least this large are reported as issues
+LARGE_TABLE_ROWS = int(os.environ.get("SQL_LARGE_TABLE_ROWS", 100_000))
+# Row estimate for CTEs/subqueries the plan scans by name
+UNKNOWN_ROWS = 1000
+
+_SCAN = re.compile(r"^(SCAN|SEARCH)(?: TABLE)? (\S+)(.*)$")
+
+
+class QueryTooExpensive(QueryTimeout):
+    """Raised instead of running a query whose estimated plan cost exceeds the budget."""
+
+
+class PlanReport(NamedTuple):
+    cost: float
+    issues: List[str]
+    # the plan needs its whole input before the first row (sort, group, distinct, aggregate)
+    blocking: bool
+    plan: List[Tuple]
+
+    def summary(self) -> str:
+        text = f"estimated cost ~{self.cost:,.0f} rows visited"
+        return text + ("; " + "; ".join(self.issues) if self.issues else "")
+
+
+class PlanVerdict(NamedTuple):
+    action: str  # "run", "limit" or "reject"
+    sql: str
+    report: Optional[PlanReport]
+    message: str
+
+
+def table_aliases(ast: exp.Expression) -> Dict[str, str]:
+    """alias (or bare name) -> table name for every table the query references."""
+    return {t.alias_or_name: t.name for t in ast.find_all(exp.Table)}
+
+
+def analyze_plan(plan: List[Tuple], row_counts: Dict[str, int], aliases: Optional[Dict[str, str]] = None) -> PlanReport:
+    """Estimate rows visited from EXPLAIN QUERY PLAN output.
+
+    Sibling SCAN/SEARCH steps under one parent are nested loops, so each step runs once
+    per row produced by the steps before it: full scans multiply, index searches cost
+    ~log2(rows) per probe. Correlated subqueries run once per outer row.
+    """
+    aliases = aliases or {}
+    loop_rows: Dict[int, float] = {}  # rows produced so far by each parent's loop
+    base: Dict[int, float] = {0: 1.0}  # how often each node's subtree is executed
+    cost, issues, blocking = 0.0, [], False
+    for node, parent, _, detail in plan:
+        outer = loop_rows.setdefault(parent, base.get(parent, 1.0))
+        base[node] = outer if detail.startswith("CORRELATED") else base.get(parent, 1.0)
+        m = _SCAN.match(detail)
+        if m:
+            kind, name, rest = m.groups()
+            if name == "CONSTANT":
+                continue
+            table = aliases.get(name, name)
+            rows = float(row_counts.get(table, UNKNOWN_ROWS))
+            if kind == "SCAN":
+                cost += outer * rows
+                loop_rows[parent] = outer * max(rows, 1.0)
+                if rows >= LARGE_TABLE_ROWS and "INDEX" not in rest:
+                    issues.append(f"full scan of {table} (~{rows:,.0f} rows)")
+                if outer > 1 and rows > 1:
+                    issues.append(f"{table} is scanned once per row of the preceding tables (cartesian product or join without a usable index)")
+            elif "AUTOMATIC" in rest:
+                cost += rows + outer * math.log2(rows + 2)
+                issues.append(f"no index for the join on {table} (SQLite builds a temporary one per run)")
+            else:
+                cost += outer * math.log2(rows + 2)
+        elif detail.startswith("USE TEMP B-TREE"):
+            rows = loop_rows.get(parent, 1.0)
+            cost += rows * math.log2(rows + 2)
+            blocking = True
+            if rows >= LARGE_TABLE_ROWS:
+                issues.append(f"temp B-tree {detail[len('USE TEMP B-TREE '):].lower()} over ~{rows:,.0f} rows")
+    # one issue per kind and table, however many plan rows raised it
+    return PlanReport(cost=cost, issues=list(dict.fromkeys(issues)), blocking=blocking, plan=plan)
+
+
+def _limit_value(ast: exp.Expression) -> Optional[int]:
+    limit = ast.args.get("limit")
+    if limit is None:
+        return None
+    try:
+        return int(limit.expression.name)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def cost_gate(
+    db: SQLiteDB,
+    sql: str,
+    ast: exp.Expression,
+    schema: SchemaInfo,
+    max_rows: int,
+    max_cost: Optional[float] = None,
+    policy: Optional[str] = None,
+) -> PlanVerdict:
+    """Decide whether sql may run: as-is, with an added LIMIT, or not at all."""
+    max_cost = PLAN_MAX_COST if max_cost is None else max_cost
+    policy = PLAN_POLICY if policy is None else policy
+    if not max_cost or policy == "off":
+        return PlanVerdict("run", sql, None, "cost gate disabled")
+    report = analyze_plan(db.query_plan(sql), schema.row_counts, table_aliases(ast))
+    if report.cost <= max_cost:
+        return PlanVerdict("run", sql, report, report.summary())
+    # aggregates read every input row before returning anything, like a sort does
+    streaming = not report.blocking and ast.find(exp.AggFunc) is None
+    if policy == "limit" and streaming:
+        limit = _limit_value(ast)
+        if limit is not None and limit <= max_rows + 1:
+            return PlanVerdict("run", sql, report, report.summary() + "; already limited")
+        limited = ast.copy().limit(max_rows + 1).sql(dialect="sqlite")
+        return PlanVerdict("limit", limited, report, report.summary() + f"; limited to {max_rows + 1} rows")
+    return PlanVerdict("reject", sql, report, f"query_too_expensive: {report.summary()} (budget {max_cost:,.0f})")
@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Hashable, Any, Dict
+
+RESULT_CACHE_BYTES = int(os.environ.get("SQL_RESULT_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+def estimate_size(rows) -> int:
+    """Approximate in-memory footprint of a list of row tuples, in bytes."""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+def sql_cache_key(sql: str) -> str:
+    """normalize_sql() so equivalent spellings share an entry; whitespace-only fallback."""
+    try:
+        from src.validation.sql_validator import normalize_sql
+        return normalize_sql(sql)
+    except Exception:
+        return " ".join(sql.split()).rstrip(";")
+
+
+class ResultCache:
+    """LRU cache of query results bounded by estimated bytes rather than entry count.
+
+    Keys must include a data version (see SQLiteDB.data_stamp) so writes invalidate them.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, entries=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes)
+
+
+_default_cache: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+
+def default_result_cache() -> Optional[ResultCache]:
+    """Process-wide result cache, or None when SQL_RESULT_CACHE_BYTES is 0."""
+    global _default_cache
+    if RESULT_CACHE_BYTES <= 0:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(RESULT_CACHE_BYTES)
+        return _default_cache
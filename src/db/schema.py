@@ -0,0 +1,156 @@
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+# Rendered table subsets kept per schema (pruned prompts differ per question)
+TEXT_CACHE_SIZE = 256
+
+
+class Column(NamedTuple):
+    name: str
+    type: str
+    pk: bool = False
+
+
+class ForeignKey(NamedTuple):
+    column: str
+    ref_table: str
+    ref_column: Optional[str]
+
+
+class JoinEdge(NamedTuple):
+    """One FK join seen from `table`: table.column = other.other_column."""
+
+    table: str
+    column: str
+    other: str
+    other_column: Optional[str]
+
+    def on(self) -> str:
+        return f"{self.table}.{self.column} = {self.other}.{self.other_column or 'id'}"
+
+
+class _Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class Table(_Frozen):
+    """One table: typed columns, primary key, outgoing FKs, a sample row and its row count
+    (None when unknown)."""
+
+    __slots__ = ("name", "columns", "column_names", "pk", "fks", "sample", "row_count")
+
+    def __init__(self, name: str, columns: Iterable[Column], fks: Iterable[ForeignKey] = (),
+                 sample: Optional[Tuple] = None, row_count: Optional[int] = None):
+        columns = tuple(columns)
+        for attr, value in dict(
+            name=name, columns=columns, column_names=tuple(c.name for c in columns),
+            pk=tuple(c.name for c in columns if c.pk), fks=tuple(fks), sample=sample, row_count=row_count,
+        ).items():
+            object.__setattr__(self, attr, value)
+
+    def render(self) -> str:
+        """Prompt block: CREATE-like column list plus an example row comment."""
+        col_lines = [f"  {c.name} {c.type}{' PRIMARY KEY' if c.pk else ''}" for c in self.columns]
+        fk_lines = [f"  FOREIGN KEY ({fk.column}) REFERENCES {fk.ref_table}({fk.ref_column})" for fk in self.fks]
+        lines = [f"TABLE {self.name} (\n" + ",\n".join(col_lines + fk_lines) + "\n)"]
+        if self.sample:
+            example = ', '.join(f"{c.name}={repr(val)}" for c, val in zip(self.columns, self.sample))
+            lines.append(f"  -- Example: {example}")
+        return "\n".join(lines)
+
+
+class SchemaText(str):
+    """Prompt text for some of a schema's tables. It is a plain string to providers, and
+    also carries the structured schema (and those tables' column names) so they need not
+    parse it back."""
+
+    schema: "SchemaInfo"
+    table_names: Tuple[str, ...]
+    tables: Mapping[str, Tuple[str, ...]]
+
+
+class SchemaInfo(_Frozen):
+    """Immutable schema of one database version, built once per version and shared.
+
+    Lookup indexes are built up front: tables {name: column names}, case-insensitive
+    name -> table, the qualified "table.column" set, FK neighbours and FK join edges.
+    They are read-only mappings of tuples and frozensets, since every caller shares them.
+    Prompt text is rendered on first use and memoized per table subset.
+    """
+
+    __slots__ = (
+        "version", "table_map", "names", "tables", "columns", "by_name", "qualified",
+        "fk_graph", "join_graph", "row_counts", "_blocks", "_texts",
+    )
+
+    def __init__(self, version: Tuple, tables: Iterable[Table]):
+        table_map = {t.name: t for t in tables}
+        fk_graph: Dict[str, set] = {}
+        join_graph: Dict[str, List[JoinEdge]] = {}
+        for t in table_map.values():
+            for fk in t.fks:
+                fk_graph.setdefault(t.name, set()).add(fk.ref_table)
+                fk_graph.setdefault(fk.ref_table, set()).add(t.name)
+                join_graph.setdefault(t.name, []).append(JoinEdge(t.name, fk.column, fk.ref_table, fk.ref_column))
+                join_graph.setdefault(fk.ref_table, []).append(JoinEdge(fk.ref_table, fk.ref_column or "id", t.name, fk.column))
+        for attr, value in dict(
+            version=version,
+            table_map=MappingProxyType(table_map),
+            names=tuple(table_map),
+            tables=MappingProxyType({n: frozenset(t.column_names) for n, t in table_map.items()}),
+            columns=MappingProxyType({n: tuple((c.name, c.type) for c in t.columns) for n, t in table_map.items()}),
+            by_name=MappingProxyType({n.lower(): n for n in table_map}),
+            qualified=frozenset(f"{n}.{c}" for n, t in table_map.items() for c in t.column_names),
+            fk_graph=MappingProxyType({n: frozenset(v) for n, v in fk_graph.items()}),
+            join_graph=MappingProxyType({n: tuple(v) for n, v in join_graph.items()}),
+            row_counts=MappingProxyType({n: t.row_count for n, t in table_map.items() if t.row_count is not None}),
+            _blocks={},
+            _texts={},
+        ).items():
+            object.__setattr__(self, attr, value)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def table(self, name: str) -> Optional[Table]:
+        """Table by name, ignoring case (SQLite identifiers are case-insensitive)."""
+        canonical = self.by_name.get(name.lower())
+        return self.table_map[canonical] if canonical else None
+
+    def joins(self, a: str, b: str) -> Tuple[JoinEdge, ...]:
+        """FK join edges between tables a and b, seen from a."""
+        return tuple(e for e in self.join_graph.get(a, ()) if e.other == b)
+
+    def block(self, name: str) -> str:
+        text = self._blocks.get(name)
+        if text is None:
+            text = self._blocks.setdefault(name, self.table_map[name].render())
+        return text
+
+    @property
+    def blocks(self) -> Dict[str, str]:
+        return {n: self.block(n) for n in self.names}
+
+    @property
+    def context(self) -> SchemaText:
+        """Prompt text for the whole schema."""
+        return self.render(self.names)
+
+    def render(self, table_names: Iterable[str]) -> SchemaText:
+        """Prompt text restricted to table_names, in schema order (memoized per subset)."""
+        key: FrozenSet[str] = frozenset(table_names)
+        text = self._texts.get(key)
+        if text is None:
+            names = tuple(n for n in self.names if n in key)
+            text = SchemaText("\n".join(self.block(n) for n in names))
+            text.schema, text.table_names = self, names
+            text.tables = MappingProxyType({n: self.table_map[n].column_names for n in names})
+            if len(self._texts) < TEXT_CACHE_SIZE:
+                text = self._texts.setdefault(key, text)
+        return text
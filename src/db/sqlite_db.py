@@ -1,52 +1,405 @@
+import os
+import time
+import atexit
 import sqlite3
-from typing import List, Tuple, Dict, Set
- 
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from typing import List, Tuple, Dict, FrozenSet, Mapping, Optional, Iterator
+from src.db.result_cache import ResultCache, sql_cache_key
+from src.db.schema import Column, ForeignKey, SchemaInfo, Table
+from src.tracing import span
+
+# Read-only connection tuning; cache_size < 0 is in KiB (SQLite convention)
+DEFAULT_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+DEFAULT_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
+# Result fetching: hard cap on materialized rows and fetchmany() batch size
+DEFAULT_MAX_ROWS = int(os.environ.get("SQL_MAX_ROWS", 1000))
+FETCH_BATCH_SIZE = 256
+# Per-query budget for generated SQL: wall-clock seconds and VM steps (0 disables)
+DEFAULT_QUERY_TIMEOUT = float(os.environ.get("SQL_QUERY_TIMEOUT", 10.0))
+DEFAULT_MAX_STEPS = int(os.environ.get("SQL_MAX_STEPS", 0))
+PROGRESS_INTERVAL = 1000
+
+
+class QueryTimeout(RuntimeError):
+    """Raised when a query is interrupted for exceeding its time or VM-step budget."""
+
+
+class ConnectionPool:
+    """Thread-local, long-lived read-only connections to a single SQLite file.
+
+    Each worker thread opens its connection once (mode=ro, mmap/cache pragmas) and
+    reuses it for every call, so setup and page-cache warmup are paid once per thread.
+    """
+
+    def __init__(self, path: str, mmap_size: int = DEFAULT_MMAP_SIZE, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.mmap_size = int(mmap_size)
+        self.cache_size = int(cache_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: List[sqlite3.Connection] = []
+        self._generation = 0
+        self._pid = os.getpid()
+        self._epoch = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = "file:" + pathname2url(os.path.abspath(self.path)) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size};")
+        conn.execute(f"PRAGMA cache_size={self.cache_size};")
+        conn.execute("PRAGMA query_only=1;")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        if os.getpid() != self._pid:
+            # forked child: never share the parent's file handles
+            self._local = threading.local()
+            self._conns = []
+            self._pid = os.getpid()
+        if getattr(self._local, "generation", None) == self._generation:
+            return self._local.conn
+        stale = getattr(self._local, "conn", None)
+        conn = self._connect()
+        with self._lock:
+            if stale is not None and stale in self._conns:
+                # retired by reset(): its owner (this thread) is done with it now
+                self._conns.remove(stale)
+                stale.close()
+            self._conns.append(conn)
+            self._local.conn = conn
+            self._local.generation = self._generation
+            self._local.data_version = None
+        return conn
+
+    def data_epoch(self) -> int:
+        """Counter bumped whenever this thread's connection sees PRAGMA data_version move,
+        i.e. another connection committed a write since we last looked."""
+        conn = self.connection()
+        version = conn.execute("PRAGMA data_version;").fetchone()[0]
+        last = getattr(self._local, "data_version", None)
+        self._local.data_version = version
+        if last is not None and last != version:
+            with self._lock:
+                self._epoch += 1
+        return self._epoch
+
+    def reset(self) -> None:
+        """Retire every connection without closing it under a running query: each
+        thread reconnects on its next checkout and closes its old connection then."""
+        with self._lock:
+            self._generation += 1
+
+    def close(self) -> None:
+        """Close every connection opened by this pool; later calls reconnect lazily."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._generation += 1
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_POOLS: Dict[Tuple[str, int, int], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: str, mmap_size: Optional[int] = None, cache_size: Optional[int] = None) -> ConnectionPool:
+    """Return the process-wide pool for path (one per path/pragma combination)."""
+    mmap_size = DEFAULT_MMAP_SIZE if mmap_size is None else int(mmap_size)
+    cache_size = DEFAULT_CACHE_SIZE if cache_size is None else int(cache_size)
+    key = (os.path.abspath(path), mmap_size, cache_size)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(path, mmap_size=mmap_size, cache_size=cache_size)
+        return pool
+
+
+def close_all_pools() -> None:
+    """Shut down every pooled connection in this process."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all_pools)
+
+
+class _Budget:
+    """Progress handler state: called every PROGRESS_INTERVAL VM instructions."""
+
+    def __init__(self, timeout: float, max_steps: int):
+        self.timeout = timeout
+        self.deadline = time.perf_counter() + timeout if timeout else None
+        self.max_steps = max_steps
+        self.steps = 0
+        self.reason = None
+
+    def __call__(self) -> int:
+        self.steps += PROGRESS_INTERVAL
+        if self.max_steps and self.steps > self.max_steps:
+            self.reason = f"exceeded {self.max_steps} VM steps"
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            self.reason = f"exceeded {self.timeout:g}s"
+        return 1 if self.reason else 0
+
+
+class RowSet(list):
+    """Capped query result. Behaves like the row list; truncated tells whether more
+    rows were available and total holds the full count when it was computed. limited
+    marks a query the plan cost gate ran with an added LIMIT, whose full size is unknown."""
+
+    def __init__(self, rows=(), truncated: bool = False, total: Optional[int] = None, limited: bool = False):
+        super().__init__(rows)
+        self.truncated = truncated
+        self.total = len(self) if total is None and not truncated else total
+        self.limited = limited
+
+
+_SCHEMA_CACHE: Dict[str, SchemaInfo] = {}
+
+
+def _file_identity(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ()
+    return (st.st_dev, st.st_ino)
+
+
+def _file_stamp(path: str) -> Tuple:
+    """Identity plus size/mtime of the DB file and its WAL, if any."""
+    stamp = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        stamp += [st.st_ino, st.st_size, st.st_mtime_ns]
+    return tuple(stamp)
+
+
+def _row_counts(cur: sqlite3.Cursor, table_names) -> Dict[str, int]:
+    """Row count per table, from sqlite_stat1 (ANALYZE) when present, else estimated as
+    MAX(rowid): one b-tree seek instead of a COUNT(*) scan, exact unless rows were deleted.
+    Tables with neither (WITHOUT ROWID, not analyzed) are left out: unknown size."""
+    counts: Dict[str, int] = {}
+    try:
+        cur.execute("SELECT tbl, stat FROM sqlite_stat1;")
+        for tbl, stat in cur.fetchall():
+            if stat:
+                counts[tbl] = max(counts.get(tbl, 0), int(str(stat).split()[0]))
+    except (sqlite3.Error, ValueError):
+        pass
+    for t in table_names:
+        if t not in counts:
+            try:
+                cur.execute(f'SELECT MAX(rowid) FROM "{t}";')
+                counts[t] = cur.fetchone()[0] or 0
+            except sqlite3.Error:
+                pass
+    return counts
+
+
+def _introspect(cur: sqlite3.Cursor) -> List[Table]:
+    """Read every table's columns, FKs, first row and row count in one pass."""
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+    names = [t for (t,) in cur.fetchall()]
+    row_counts = _row_counts(cur, names)
+    tables = []
+    for t in names:
+        cur.execute(f"PRAGMA table_info({t});")
+        cols = [Column(c[1], c[2], bool(c[5])) for c in cur.fetchall()]
+        cur.execute(f"PRAGMA foreign_key_list({t});")
+        fks = [ForeignKey(fk[3], fk[2], fk[4]) for fk in cur.fetchall()]
+        try:
+            cur.execute(f"SELECT * FROM {t} LIMIT 1;")
+            sample = cur.fetchone()
+        except Exception:
+            sample = None
+        tables.append(Table(t, cols, fks, sample, row_counts.get(t)))
+    return tables
+
+
+def load_schema(path: str, pool: Optional[ConnectionPool] = None) -> SchemaInfo:
+    """Return the cached schema for path, rebuilding it only when the file identity
+    or PRAGMA schema_version changes. The result is shared process-wide; do not mutate it.
+    """
+    key = os.path.abspath(path)
+    pool = pool or get_pool(path)
+    identity = _file_identity(key)
+    cached = _SCHEMA_CACHE.get(key)
+    if cached is not None and cached.version[:-1] != identity:
+        # file was replaced: pooled connections still point at the old inode
+        pool.reset()
+    cur = pool.connection().cursor()
+    try:
+        cur.execute("PRAGMA schema_version;")
+        version = identity + (cur.fetchone()[0],)
+        if cached is not None and cached.version == version:
+            return cached
+        with span("db.introspect"):
+            tables = _introspect(cur)
+    finally:
+        cur.close()
+    info = _SCHEMA_CACHE[key] = SchemaInfo(version, tables)
+    return info
+
+
+def clear_schema_cache() -> None:
+    _SCHEMA_CACHE.clear()
+
+
 class SQLiteDB:
-    def __init__(self, path: str):
+    def __init__(
+        self,
+        path: str,
+        mmap_size: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_steps: Optional[int] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
         self.path = path
- 
-    def tables(self) -> Dict[str, Set[str]]:
-        with sqlite3.connect(self.path) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
-            out = {}
-            for (t,) in cur.fetchall():
-                cur.execute(f"PRAGMA table_info({t});")
-                out[t] = {c[1] for c in cur.fetchall()}
-        return out
- 
-    def execute(self, sql: str) -> List[Tuple]:
-        with sqlite3.connect(self.path) as conn:
-            cur = conn.cursor()
+        self.pool = get_pool(path, mmap_size=mmap_size, cache_size=cache_size)
+        self.result_cache = result_cache
+        self.timeout = DEFAULT_QUERY_TIMEOUT if timeout is None else timeout
+        self.max_steps = DEFAULT_MAX_STEPS if max_steps is None else max_steps
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        """No-op: connections belong to the process-wide pool that other instances and
+        threads share. close_all_pools() (also run at exit) tears them down."""
+
+    @contextmanager
+    def _budgeted(self, timeout: Optional[float] = None, max_steps: Optional[int] = None) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor whose statements are interrupted once the budget is spent.
+
+        None falls back to the instance defaults; 0 disables that limit.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        max_steps = self.max_steps if max_steps is None else max_steps
+        conn = self.pool.connection()
+        cur = conn.cursor()
+        budget = _Budget(timeout, max_steps) if (timeout or max_steps) else None
+        if budget:
+            conn.set_progress_handler(budget, PROGRESS_INTERVAL)
+        try:
+            yield cur
+        except sqlite3.OperationalError as e:
+            if budget and budget.reason:
+                raise QueryTimeout(f"query_timeout: {budget.reason}") from e
+            raise
+        finally:
+            if budget:
+                conn.set_progress_handler(None, 0)
+            cur.close()
+
+    def schema(self) -> SchemaInfo:
+        return load_schema(self.path, self.pool)
+
+    def tables(self) -> Mapping[str, FrozenSet[str]]:
+        return self.schema().tables
+
+    def data_stamp(self) -> Tuple:
+        """Changes whenever the database content may have changed (data_version epoch + file stamp)."""
+        return (self.pool.data_epoch(),) + _file_stamp(os.path.abspath(self.path))
+
+    def _result_key(self, kind: str, sql: str, *extra) -> Tuple:
+        return (kind, os.path.abspath(self.path), sql_cache_key(sql), self.data_stamp()) + extra
+
+    def execute(self, sql: str, timeout: Optional[float] = None, max_steps: Optional[int] = None) -> List[Tuple]:
+        key = self._result_key("all", sql) if self.result_cache is not None else None
+        if key is not None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return list(cached)
+        with span("db.execute"), self._budgeted(timeout, max_steps) as cur:
             cur.execute(sql)
+            rows = cur.fetchall()
+        if key is not None:
+            self.result_cache.put(key, rows)
+        return rows
+
+    def iter_rows(
+        self,
+        sql: str,
+        batch_size: int = FETCH_BATCH_SIZE,
+        timeout: Optional[float] = None,
+        max_steps: Optional[int] = None,
+    ) -> Iterator[Tuple]:
+        """Stream result rows with fetchmany() instead of materializing them all.
+        The budget covers the whole iteration, not just the first step."""
+        with self._budgeted(timeout, max_steps) as cur:
+            cur.execute(sql)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    return
+                yield from batch
+
+    def fetch(
+        self,
+        sql: str,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        count: bool = False,
+        timeout: Optional[float] = None,
+        max_steps: Optional[int] = None,
+    ) -> RowSet:
+        """Return at most max_rows rows. If the result was cut off and count is set,
+        total is filled in with a separate COUNT(*) over the query."""
+        key = self._result_key("fetch", sql, max_rows, count) if self.result_cache is not None else None
+        if key is not None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return RowSet(cached, truncated=cached.truncated, total=cached.total)
+        rows = []
+        truncated = False
+        batch_size = max(1, min(FETCH_BATCH_SIZE, max_rows + 1))
+        stream = self.iter_rows(sql, batch_size=batch_size, timeout=timeout, max_steps=max_steps)
+        try:
+            with span("db.fetch") as s:
+                for row in stream:
+                    if len(rows) >= max_rows:
+                        truncated = True
+                        break
+                    rows.append(row)
+                s.set(rows=len(rows))
+        finally:
+            stream.close()
+        total = None
+        if truncated and count:
+            try:
+                total = self.count(sql, timeout=timeout, max_steps=max_steps)
+            except QueryTimeout:
+                pass  # keep the rows we already have; the total stays unknown
+        result = RowSet(rows, truncated=truncated, total=total)
+        if key is not None:
+            self.result_cache.put(key, result)
+        return RowSet(result, truncated=truncated, total=result.total)
+
+    def count(self, sql: str, timeout: Optional[float] = None, max_steps: Optional[int] = None) -> int:
+        with span("db.count"), self._budgeted(timeout, max_steps) as cur:
+            cur.execute(f"SELECT COUNT(*) FROM ({sql.strip().rstrip(';')})")
+            return cur.fetchone()[0]
+
+    def query_plan(self, sql: str) -> List[Tuple]:
+        """EXPLAIN QUERY PLAN rows: (id, parent, notused, detail)."""
+        with span("db.plan"), self._budgeted() as cur:
+            cur.execute(f"EXPLAIN QUERY PLAN {sql}")
             return cur.fetchall()
- 
-    def explain(self, sql: str) -> List[Tuple]:
-        with sqlite3.connect(self.path) as conn:
-            cur = conn.cursor()
-            cur.execute(f"EXPLAIN {sql}")
-            return cur.fetchall()
- 
+
     def describe_schema(self) -> str:
-        with sqlite3.connect(self.path) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
-            lines = []
-            for (t,) in cur.fetchall():
-                cur.execute(f"PRAGMA table_info({t});")
-                cols = cur.fetchall()
-                col_lines = [f"  {c[1]} {c[2]}{' PRIMARY KEY' if c[5] else ''}" for c in cols]
-                cur.execute(f"PRAGMA foreign_key_list({t});")
-                fks = cur.fetchall()
-                fk_lines = [f"  FOREIGN KEY ({fk[3]}) REFERENCES {fk[2]}({fk[4]})" for fk in fks]
-                lines.append(f"TABLE {t} (\n" + ",\n".join(col_lines + fk_lines) + "\n)")
-                try:
-                    cur.execute(f"SELECT * FROM {t} LIMIT 1;")
-                    row = cur.fetchone()
-                    if row:
-                        example = ', '.join(f"{c[1]}={repr(val)}" for c, val in zip(cols, row))
-                        lines.append(f"  -- Example: {example}")
-                except Exception:
-                    continue
-            return "\n".join(lines)
- 
\ No newline at end of file
+        return self.schema().context
@@ -1,24 +1,34 @@
 import os
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
 from tqdm import tqdm
 from src.chain.text_to_sql import TextToSQLChain
 from src.validation.sql_validator import normalize_sql
-from src.db.sqlite_db import SQLiteDB
+from src.db.sqlite_db import SQLiteDB, QueryTimeout
+from src.db.query_plan import QueryTooExpensive
+from src.eval.gold_cache import GoldCache
+from src.tracing import percentile, stage_percentiles, trace
 import json
 
-def exact_match(pred, gold):
+def exact_match(pred, gold, gold_cache: Optional[GoldCache] = None):
     try:
-        return normalize_sql(pred) == normalize_sql(gold)
+        gold_norm = gold_cache.normalize(gold) if gold_cache else normalize_sql(gold)
+        if gold_norm is None:
+            raise ValueError("unparseable gold SQL")
+        return normalize_sql(pred) == gold_norm
     except Exception:
         return pred.strip().lower() == gold.strip().lower()
 
 
-def execution_accuracy(pred_sql, gold_sql, db_path):
+def execution_accuracy(pred_sql, gold_sql, db_path, gold_cache: Optional[GoldCache] = None):
     db = SQLiteDB(db_path)
     try:
         pred_rows = db.execute(pred_sql)
     except Exception:
         return False
+    if gold_cache:
+        gold_rows = gold_cache.rows(db_path, gold_sql)
+        return gold_rows is not None and pred_rows == gold_rows
     try:
         gold_rows = db.execute(gold_sql)
     except Exception:
@@ -26,56 +36,176 @@ def execution_accuracy(pred_sql, gold_sql, db_path):
     return pred_rows == gold_rows
 
 
+def generation_summary(results: List[Dict]) -> Dict:
+    """Token, speed and cost totals over every generate_sql call (retries included).
+
+    tokens_per_sec is completion tokens over decode time (wall time when the provider
+    does not report it); ttft/wall are per-call p50s; cost_usd is None when no call
+    reported a price.
+    """
+    records = [g for r in results for g in r.get("generations", [])]
+    timed = [g for g in records if g.get("completion_tokens")]
+    decode_ms = sum(g.get("decode_ms") or g.get("wall_ms") or 0.0 for g in timed)
+    costs = [g["cost_usd"] for g in records if g.get("cost_usd") is not None]
+    ttft = sorted(g["ttft_ms"] for g in records if g.get("ttft_ms") is not None)
+    wall = sorted(g["wall_ms"] for g in records if g.get("wall_ms") is not None)
+    return dict(
+        calls=len(records),
+        prompt_tokens=sum(g.get("prompt_tokens") or 0 for g in records),
+        completion_tokens=sum(g.get("completion_tokens") or 0 for g in records),
+        cached_tokens=sum(g.get("cached_tokens") or 0 for g in records),
+        tokens_per_sec=round(sum(g["completion_tokens"] for g in timed) / (decode_ms / 1000), 2) if decode_ms else None,
+        ttft_ms_p50=round(percentile(ttft, 50), 3) if ttft else None,
+        wall_ms_p50=round(percentile(wall, 50), 3) if wall else None,
+        cost_usd=round(sum(costs), 6) if costs else None,
+        cost_per_question_usd=round(sum(costs) / len(results), 8) if costs and results else None,
+    )
+
+
+def tier_summary(results: List[Dict]) -> Dict:
+    """{tier: {calls, hit_rate, errors, p50_ms, p95_ms}} over routed generate_sql calls (router
+    providers only; empty otherwise). hit_rate is the tier's share of routed calls; errors
+    counts the calls that raised (failed escalations)."""
+    routed = [x for r in results for x in r.get("tiers", [])]
+    by_tier: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for x in routed:
+        by_tier.setdefault(x["tier"], []).append(x["ms"])
+        errors[x["tier"]] = errors.get(x["tier"], 0) + (not x.get("ok", True))
+    out = {}
+    for tier, ms in sorted(by_tier.items()):
+        ms.sort()
+        out[tier] = dict(
+            calls=len(ms), hit_rate=round(len(ms) / len(routed), 4), errors=errors[tier],
+            p50_ms=round(percentile(ms, 50), 3), p95_ms=round(percentile(ms, 95), 3),
+        )
+    return out
+
+
+def resolve_db_path(item: Dict, db_root: Optional[str], default_db: Optional[str]) -> Optional[str]:
+    db_id = item.get("db_id")
+    if db_root and db_id:
+        candidate = os.path.join(db_root, db_id, f"{db_id}.sqlite")
+        if os.path.exists(candidate):
+            return candidate
+    return default_db
+
+
+def score_item(item: Dict, db_path: Optional[str], pred_sql: str, exc: Optional[Exception] = None, gold_cache: Optional[GoldCache] = None) -> Dict:
+    """Score one prediction (or the exception that replaced it); error is None, syntax,
+    execution, timeout, rejected (refused by the plan cost gate, never run) or logic."""
+    question, gold_sql = item["question"], item["query"]
+    error_type = None
+    if isinstance(exc, QueryTooExpensive):
+        pred_sql = ""
+        error_type = "rejected"
+    elif isinstance(exc, QueryTimeout):
+        pred_sql = ""
+        error_type = "timeout"
+    elif exc is not None:
+        msg = str(exc).lower()
+        pred_sql = ""
+        if "validation_failed" in msg or "syntax" in msg:
+            error_type = "syntax"
+        else:
+            error_type = "execution"
+    if not pred_sql and error_type is None:
+        error_type = "syntax"
+    em = ex = False
+    if pred_sql:
+        em = exact_match(pred_sql, gold_sql, gold_cache)
+        if db_path:
+            ex = execution_accuracy(pred_sql, gold_sql, db_path, gold_cache)
+            if not ex:
+                error_type = "logic"
+    return dict(question=question, gold_sql=gold_sql, pred_sql=pred_sql, em=em, ex=ex, error=error_type)
+
+
+def evaluate_item(chain: TextToSQLChain, item: Dict, provider: str, db_path: Optional[str], gold_cache: Optional[GoldCache] = None) -> Dict:
+    """Predict and score one dataset item; timings holds its per-stage milliseconds."""
+    pred_sql, exc = "", None
+    with trace() as t:
+        try:
+            pred_sql, _, _ = chain.run(item["question"], provider_name=provider, db_path=db_path, count=False)
+        except Exception as e:
+            exc = e
+    result = score_item(item, db_path, pred_sql, exc, gold_cache)
+    result["timings"] = dict(t.stage_ms(), total=t.wall_ms)
+    result["generations"] = t.attrs.get("generations", [])
+    result["tiers"] = t.attrs.get("tiers", [])
+    return result
+
+
+_worker_chain = _worker_gold = None
+
+
+def _init_process_worker(gold_cache: GoldCache):
+    global _worker_chain, _worker_gold
+    _worker_chain = TextToSQLChain(cache=False)
+    _worker_gold = gold_cache
+
+
+def _evaluate_in_process(item: Dict, provider: str, db_path: Optional[str]) -> Dict:
+    return evaluate_item(_worker_chain, item, provider, db_path, _worker_gold)
+
+
 def run_benchmark(
     dataset_path: str,
     provider: str,
     db_root: Optional[str] = None,
     default_db: Optional[str] = None,
     limit: Optional[int] = None,
+    workers: int = 1,
+    use_processes: bool = False,
+    gold_cache: Optional[GoldCache] = None,
 ) -> Dict:
     """Run EM/EX/error metrics over a Spider-like dataset.
 
     If db_root is provided, uses db_root/{db_id}/{db_id}.sqlite; otherwise uses default_db.
-    Returns dict with count, em, ex, syntax_error_rate, logic_error_rate, results list.
+    Predictions come from TextToSQLChain.run_many, so one provider instance serves the whole
+    run. With workers > 1 items run on a bounded thread pool (network-bound providers), or on a
+    process pool when use_processes is set (CPU-bound providers such as naive). Results keep
+    dataset order either way. Pass a shared gold_cache to reuse gold normalization/results
+    across provider runs.
+    Returns dict with count, em, ex, syntax_error_rate, logic_error_rate, execution_error_rate,
+    timeout_error_rate, rejected_rate, generation_stats (see generation_summary), routing (router
+    providers' per-tier hit rates and latencies, see tier_summary),
+    stage_latency ({stage: {count, p50, p95, p99}} in ms, "total" = whole request) and
+    results list (each item with its per-stage timings). Predictions that exhaust the query budget count as timeouts;
+    ones the plan cost gate refused to run count as rejected.
     """
     with open(dataset_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     if limit:
         data = data[:limit]
 
-    chain = TextToSQLChain()
-    stats = dict(em=0, ex=0, syntax=0, logic=0, execution=0)
-    results = []
-    for item in tqdm(data, desc=f"benchmark ({provider})"):
-        question, gold_sql = item["question"], item["query"]
-        db_id = item.get("db_id")
-        db_path = default_db
-        if db_root and db_id:
-            candidate = os.path.join(db_root, db_id, f"{db_id}.sqlite")
-            if os.path.exists(candidate):
-                db_path = candidate
-        error_type = None
-        try:
-            pred_sql, _, _ = chain.run(question, provider_name=provider, db_path=db_path)
-        except Exception as e:
-            msg = str(e).lower()
-            pred_sql = ""
-            if "validation_failed" in msg or "syntax" in msg:
-                error_type = "syntax"; stats["syntax"] += 1
-            else:
-                error_type = "execution"; stats["execution"] += 1
-        if not pred_sql and error_type is None:
-            error_type = "syntax"; stats["syntax"] += 1
-        em = ex = False
-        if pred_sql:
-            em = exact_match(pred_sql, gold_sql)
-            stats["em"] += int(em)
-            if db_path:
-                ex = execution_accuracy(pred_sql, gold_sql, db_path)
-                stats["ex"] += int(ex)
-                if not ex:
-                    stats["logic"] += 1; error_type = "logic"
-        results.append(dict(question=question, gold_sql=gold_sql, pred_sql=pred_sql, em=em, ex=ex, error=error_type))
+    db_paths = [resolve_db_path(item, db_root, default_db) for item in data]
+    gold_cache = gold_cache or GoldCache()
+    gold_cache.warm(data, db_paths)
+    desc = f"benchmark ({provider})"
+    results = [None] * len(data)
+    if workers > 1 and use_processes:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker, initargs=(gold_cache,)) as pool:
+            futures = {pool.submit(_evaluate_in_process, item, provider, db_path): i for i, (item, db_path) in enumerate(zip(data, db_paths))}
+            for fut in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                results[futures[fut]] = fut.result()
+    else:
+        # no generation cache: every item must measure a real provider call
+        chain = TextToSQLChain(cache=False, trace=True)
+        batch = chain.run_many([item["question"] for item in data], provider, db_paths, workers=workers, count=False)
+        for i, answer, exc in tqdm(batch, total=len(data), desc=desc):
+            results[i] = score_item(data[i], db_paths[i], answer[0] if answer else "", exc, gold_cache)
+        for t in chain.traces:
+            results[t.attrs["index"]]["timings"] = dict(t.stage_ms(), total=t.wall_ms)
+            results[t.attrs["index"]]["generations"] = t.attrs.get("generations", [])
+            results[t.attrs["index"]]["tiers"] = t.attrs.get("tiers", [])
+
+    stats = dict(em=0, ex=0, syntax=0, logic=0, execution=0, timeout=0, rejected=0)
+    for r in results:
+        stats["em"] += int(r["em"])
+        stats["ex"] += int(r["ex"])
+        if r["error"]:
+            stats[r["error"]] += 1
     n = len(data)
     return dict(
         count=n,
@@ -85,5 +215,10 @@ def run_benchmark(
         syntax_error_rate=round(stats["syntax"] / n, 4) if n else 0.0,
         logic_error_rate=round(stats["logic"] / n, 4) if n else 0.0,
         execution_error_rate=round(stats["execution"] / n, 4) if n else 0.0,
+        timeout_error_rate=round(stats["timeout"] / n, 4) if n else 0.0,
+        rejected_rate=round(stats["rejected"] / n, 4) if n else 0.0,
+        generation_stats=generation_summary(results),
+        routing=tier_summary(results),
+        stage_latency=stage_percentiles(r.get("timings") for r in results),
         results=results,
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,118 @@
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.db.sqlite_db import SQLiteDB
+from src.validation.sql_validator import normalize_sql
+
+
+def default_cache_path(dataset_path: str) -> str:
+    """Persisted gold cache lives next to the dataset: foo.json -> foo.gold_cache.json."""
+    root, _ = os.path.splitext(dataset_path)
+    return root + ".gold_cache.json"
+
+
+def _db_stamp(db_path: str) -> List:
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return []
+    return [st.st_size, st.st_mtime_ns]
+
+
+class GoldCache:
+    """Gold-side work shared by every provider run in a comparison.
+
+    Normalized gold SQL is cached per query and gold results per (db_path, query), so
+    exact_match / execution_accuracy do the gold half once instead of once per provider.
+    With a path the cache is loaded from and saved to disk; gold results are dropped
+    when the database file changes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.normalized: Dict[str, Optional[str]] = {}
+        # db_path -> {"stamp": [...], "rows": {query: rows or None on error}}
+        self.results: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def normalize(self, gold_sql: str) -> Optional[str]:
+        """normalize_sql(gold_sql), or None if sqlglot cannot parse it."""
+        if gold_sql not in self.normalized:
+            try:
+                value = normalize_sql(gold_sql)
+            except Exception:
+                value = None
+            self.normalized[gold_sql] = value
+        return self.normalized[gold_sql]
+
+    def _db_entry(self, db_path: str) -> Dict:
+        key = os.path.abspath(db_path)
+        stamp = _db_stamp(key)
+        with self._lock:
+            entry = self.results.get(key)
+            if entry is None or entry["stamp"] != stamp:
+                entry = self.results[key] = {"stamp": stamp, "rows": {}}
+            return entry
+
+    def rows(self, db_path: str, gold_sql: str) -> Optional[List[Tuple]]:
+        """Gold result rows, or None if the gold query fails to execute."""
+        cached = self._db_entry(db_path)["rows"]
+        if gold_sql not in cached:
+            try:
+                value = SQLiteDB(db_path).execute(gold_sql)
+            except Exception:
+                value = None
+            cached[gold_sql] = value
+        return cached[gold_sql]
+
+    def warm(self, items: List[Dict], db_paths: List[Optional[str]]) -> None:
+        """Compute every gold normalization/result up front (e.g. before forking workers)."""
+        for item, db_path in zip(items, db_paths):
+            self.normalize(item["query"])
+            if db_path:
+                self.rows(db_path, item["query"])
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"(Ignoring unreadable gold cache {self.path}: {e})")
+            return
+        self.normalized.update(data.get("normalized", {}))
+        for db_path, entry in data.get("results", {}).items():
+            rows = {q: None if r is None else [tuple(row) for row in r] for q, r in entry.get("rows", {}).items()}
+            self.results[db_path] = {"stamp": entry.get("stamp", []), "rows": rows}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            results = {}
+            for db_path, entry in self.results.items():
+                rows = {}
+                for q, r in entry["rows"].items():
+                    try:
+                        json.dumps(r)
+                    except TypeError:
+                        continue  # e.g. BLOB values; recomputed next run
+                    rows[q] = r
+                results[db_path] = {"stamp": entry["stamp"], "rows": rows}
+            data = dict(normalized=self.normalized, results=results)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
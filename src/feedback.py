@@ -1,9 +1,222 @@
-import json
 import os
+import json
+import sqlite3
+import threading
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 
+# Legacy JSONL log; imported once into the SQLite store
 FEEDBACK_PATH = os.environ.get("FEEDBACK_LOG_PATH", "eval/feedback.jsonl")
+FEEDBACK_DB_PATH = os.environ.get("FEEDBACK_DB_PATH", "eval/feedback.sqlite")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS feedback (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL,
+  question TEXT NOT NULL,
+  provider TEXT,
+  sql TEXT,
+  rows INTEGER,
+  summary TEXT,
+  feedback TEXT,
+  correction TEXT,
+  kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_ts ON feedback(ts);
+CREATE INDEX IF NOT EXISTS feedback_provider ON feedback(provider);
+CREATE INDEX IF NOT EXISTS feedback_kind ON feedback(kind, id);
+CREATE TABLE IF NOT EXISTS feedback_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS = ("ts", "question", "provider", "sql", "rows", "summary", "feedback", "correction")
+
+
+def entry_kind(feedback: Optional[str], correction: Optional[str]) -> str:
+    """correction wins over a thumbs rating; otherwise the rating itself (up/down)."""
+    return "correction" if correction else (feedback or "none")
+
+
+def _legacy_row(item) -> Optional[tuple]:
+    """INSERT values for one legacy JSONL entry, or None when it cannot be stored."""
+    if not isinstance(item, dict) or not item.get("question") or not item.get("ts"):
+        return None
+    values = tuple(item.get(c) for c in COLUMNS)
+    if any(v is not None and not isinstance(v, (str, int, float)) for v in values):
+        return None
+    return values + (entry_kind(item.get("feedback"), item.get("correction")),)
+
+
+class FeedbackStore:
+    """SQLite-backed feedback log (WAL, indexed by ts/provider/kind).
+
+    Appends are single INSERTs, so concurrent writers (threads or processes) never
+    interleave. Recent few-shot examples are cached in-process and refreshed only when
+    PRAGMA data_version shows another connection wrote, or after our own writes.
+    """
+
+    def __init__(self, path: str = FEEDBACK_DB_PATH, jsonl_path: Optional[str] = FEEDBACK_PATH):
+        self.path = path
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._version = None
+        self._examples: Dict[int, List[Dict[str, str]]] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.executescript(SCHEMA_SQL)
+            self._conn = conn
+            if self.jsonl_path:
+                try:
+                    self._migrate_jsonl(self.jsonl_path)
+                except Exception as e:
+                    # the legacy log must never block new feedback; `--migrate` can retry it
+                    print(f"(Could not import {self.jsonl_path}: {e})")
+        return self._conn
+
+    def _readable(self) -> bool:
+        """False while nothing was ever logged, so reads don't create the store."""
+        return self._conn is not None or os.path.exists(self.path) or bool(self.jsonl_path and os.path.exists(self.jsonl_path))
+
+    def _migrate_jsonl(self, jsonl_path: str) -> int:
+        """Import a legacy JSONL log once; later calls are no-ops. Returns rows imported.
+        Malformed lines (bad JSON, no question/ts, non-scalar values) are skipped and counted."""
+        conn = self._conn
+        marker = f"migrated:{os.path.abspath(jsonl_path)}"
+        if not os.path.exists(jsonl_path):
+            return 0
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            if conn.execute("SELECT 1 FROM feedback_meta WHERE key = ?;", (marker,)).fetchone():
+                conn.execute("COMMIT;")
+                return 0
+            rows, skipped = [], 0
+            with open(jsonl_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        row = _legacy_row(json.loads(line))
+                    except ValueError:
+                        row = None
+                    if row is None:
+                        skipped += 1
+                    else:
+                        rows.append(row)
+            conn.executemany(
+                f"INSERT INTO feedback({', '.join(COLUMNS)}, kind) VALUES ({', '.join('?' * (len(COLUMNS) + 1))});",
+                rows,
+            )
+            conn.execute("INSERT INTO feedback_meta(key, value) VALUES (?, ?);", (marker, str(len(rows))))
+            conn.execute("COMMIT;")
+        except Exception:
+            conn.execute("ROLLBACK;")
+            raise
+        if skipped:
+            print(f"(Skipped {skipped} malformed feedback entries in {jsonl_path})")
+        self._examples.clear()
+        return len(rows)
+
+    def migrate_jsonl(self, jsonl_path: Optional[str] = None) -> int:
+        with self._lock:
+            self._connection()
+            return self._migrate_jsonl(jsonl_path or self.jsonl_path)
+
+    def append(self, entry: Dict) -> None:
+        with self._lock:
+            conn = self._connection()
+            values = tuple(entry.get(c) for c in COLUMNS)
+            conn.execute(
+                f"INSERT INTO feedback({', '.join(COLUMNS)}, kind) VALUES ({', '.join('?' * (len(COLUMNS) + 1))});",
+                values + (entry_kind(entry.get("feedback"), entry.get("correction")),),
+            )
+            self._examples.clear()
+
+    def recent_examples(self, max_examples: int = 3) -> List[Dict[str, str]]:
+        """Latest corrected or upvoted entries as few-shots, oldest first."""
+        with self._lock:
+            if not self._readable():
+                return []  # nothing logged yet; don't create the store just to read it
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version;").fetchone()[0]
+            if version != self._version:
+                self._version = version
+                self._examples.clear()
+            cached = self._examples.get(max_examples)
+            if cached is None:
+                rows = conn.execute(
+                    "SELECT question, sql, correction, kind FROM feedback "
+                    "WHERE kind = 'correction' OR (kind = 'up' AND sql IS NOT NULL AND sql != '') "
+                    "ORDER BY id DESC LIMIT ?;",
+                    (max_examples,),
+                ).fetchall()
+                cached = self._examples[max_examples] = [
+                    {"question": q or "", "sql": correction if kind == "correction" else sql}
+                    for q, sql, correction, kind in reversed(rows)
+                ]
+            return list(cached)
+
+    def examples_since(self, last_id: int = 0) -> List[Dict]:
+        """Few-shot-eligible entries with id > last_id (for incremental indexes), oldest first."""
+        with self._lock:
+            if not self._readable():
+                return []
+            rows = self._connection().execute(
+                "SELECT id, question, sql, correction, kind FROM feedback "
+                "WHERE id > ? AND (kind = 'correction' OR (kind = 'up' AND sql IS NOT NULL AND sql != '')) "
+                "ORDER BY id;",
+                (last_id,),
+            ).fetchall()
+        return [
+            {"id": i, "question": q or "", "sql": correction if kind == "correction" else sql}
+            for i, q, sql, correction, kind in rows
+        ]
+
+    def entries(self, kind: Optional[str] = None, provider: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate stored entries (oldest first), optionally filtered by kind/provider.
+        Yields nothing when the store does not exist yet or cannot be read."""
+        where, params = [], []
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if provider:
+            where.append("provider = ?")
+            params.append(provider)
+        sql = f"SELECT {', '.join(COLUMNS)}, kind FROM feedback"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            if not self._readable():
+                return  # nothing logged yet; don't create the store just to read it
+            try:
+                rows = self._connection().execute(sql + " ORDER BY id;", params).fetchall()
+            except sqlite3.Error:
+                return
+        for row in rows:
+            yield dict(zip(COLUMNS + ("kind",), row))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store: Optional[FeedbackStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> FeedbackStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedbackStore()
+        return _store
 
 
 def log_feedback(
@@ -16,12 +229,11 @@ def log_feedback(
     correction: Optional[str] = None,
 ) -> None:
     """
-    Log user feedback or correction to FEEDBACK_PATH. Skips logging if both feedback and correction are missing.
+    Log user feedback or correction to the feedback store. Skips logging if both feedback and correction are missing.
     """
     if not feedback and not correction:
         return
-    os.makedirs(os.path.dirname(FEEDBACK_PATH), exist_ok=True)
-    entry = {k: v for k, v in dict(
+    entry = dict(
         ts=datetime.utcnow().isoformat() + "Z",
         question=question,
         provider=provider,
@@ -30,10 +242,9 @@ def log_feedback(
         summary=summary,
         feedback=feedback,
         correction=correction,
-    ).items() if v is not None}
+    )
     try:
-        with open(FEEDBACK_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        get_store().append(entry)
     except Exception as e:
         print(f"(Could not log feedback: {e})")
 
@@ -42,18 +253,14 @@ def load_feedback_examples(max_examples: int = 3) -> List[Dict[str, str]]:
     """
     Return recent corrected or upvoted examples as few-shots for prompting.
     """
-    if not os.path.exists(FEEDBACK_PATH):
-        return []
-    with open(FEEDBACK_PATH, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    def parse(line):
-        try:
-            item = json.loads(line)
-            if item.get("correction"):
-                return {"question": item.get("question", ""), "sql": item.get("correction", "")}
-            if item.get("feedback") == "up" and item.get("sql"):
-                return {"question": item.get("question", ""), "sql": item.get("sql", "")}
-        except Exception:
-            return None
-    examples = [ex for ex in (parse(line) for line in lines) if ex]
-    return examples[-max_examples:]
+    return get_store().recent_examples(max_examples)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Feedback store maintenance")
+    parser.add_argument("--migrate", metavar="JSONL", nargs="?", const=FEEDBACK_PATH, help="Import a legacy feedback JSONL file (once)")
+    args = parser.parse_args()
+    if args.migrate:
+        n = get_store().migrate_jsonl(args.migrate)
+        print(f"Imported {n} feedback entries from {args.migrate} into {FEEDBACK_DB_PATH}")
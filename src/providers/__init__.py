@@ -1,31 +1,79 @@
-from .naive_provider import NaiveProvider
-try:
-    from .openai_provider import OpenAIProvider
-except Exception:
-    OpenAIProvider = None
-try:
-    from .ollama_provider import OllamaProvider
-except Exception:
-    OllamaProvider = None
-
-PROVIDERS = {
-    "naive": NaiveProvider,
-    "openai": OpenAIProvider,
+import importlib
+import threading
+from collections.abc import Mapping
+from functools import partial
+
+# Provider name -> (module, class, constructor kwargs). Modules are imported on first lookup,
+# so e.g. --provider naive never loads the openai/ollama client libraries.
+_OLLAMA = ".ollama_provider", "OllamaProvider"
+_SPECS = {
+    "naive": (".naive_provider", "NaiveProvider", {}),
+    "openai": (".openai_provider", "OpenAIProvider", {}),
     # Ollama models
-    "ollama-phi3": (lambda: OllamaProvider(name="ollama-phi3", model="phi3:medium")) if OllamaProvider is not None else None,
-    "ollama-qwen": (lambda: OllamaProvider(name="ollama-qwen", model="qwen2.5:7b")) if OllamaProvider is not None else None,
-    "ollama-codellama": (lambda: OllamaProvider(name="ollama-codellama", model="codellama:7b")) if OllamaProvider is not None else None,
-    "ollama-hrida": (lambda: OllamaProvider(name="ollama-hrida", model="HridaAI/hrida-t2sql-128k:latest")) if OllamaProvider is not None else None,
-    "ollama-deepseek": (lambda: OllamaProvider(name="ollama-deepseek", model="deepseek-coder:6.7b")) if OllamaProvider is not None else None,
-    "ollama-duckdb": (lambda: OllamaProvider(name="ollama-duckdb", model="duckdb-nsql:7b")) if OllamaProvider is not None else None,
+    "ollama-phi3": (*_OLLAMA, dict(name="ollama-phi3", model="phi3:medium")),
+    "ollama-qwen": (*_OLLAMA, dict(name="ollama-qwen", model="qwen2.5:7b")),
+    "ollama-codellama": (*_OLLAMA, dict(name="ollama-codellama", model="codellama:7b")),
+    "ollama-hrida": (*_OLLAMA, dict(name="ollama-hrida", model="HridaAI/hrida-t2sql-128k:latest")),
+    "ollama-deepseek": (*_OLLAMA, dict(name="ollama-deepseek", model="deepseek-coder:6.7b")),
+    "ollama-duckdb": (*_OLLAMA, dict(name="ollama-duckdb", model="duckdb-nsql:7b")),
+    # Template fast path, escalating to an LLM (ROUTER_LLM) when no template matches confidently
+    "router": (".router_provider", "RouterProvider", {}),
+    "router-openai": (".router_provider", "RouterProvider", dict(llm="openai")),
+    "router-ollama": (".router_provider", "RouterProvider", dict(llm="ollama")),
     # Aliases
-    "ollama": (lambda: OllamaProvider(name="ollama-qwen", model="qwen2.5:7b")) if OllamaProvider is not None else None,
-    "ollama-all": [
-        (lambda: OllamaProvider(name="ollama-phi3", model="phi3:medium")) if OllamaProvider is not None else None,
-        (lambda: OllamaProvider(name="ollama-qwen", model="qwen2.5:7b")) if OllamaProvider is not None else None,
-        (lambda: OllamaProvider(name="ollama-codellama", model="codellama:7b")) if OllamaProvider is not None else None,
-        (lambda: OllamaProvider(name="ollama-hrida", model="HridaAI/hrida-t2sql-128k:latest")) if OllamaProvider is not None else None,
-        (lambda: OllamaProvider(name="ollama-deepseek", model="deepseek-coder:6.7b")) if OllamaProvider is not None else None,
-        (lambda: OllamaProvider(name="ollama-duckdb", model="duckdb-nsql:7b")) if OllamaProvider is not None else None,
-    ],
-}
\ No newline at end of file
+    "ollama": (*_OLLAMA, dict(name="ollama-qwen", model="qwen2.5:7b")),
+}
+_GROUPS = {
+    "ollama-all": ["ollama-phi3", "ollama-qwen", "ollama-codellama", "ollama-hrida", "ollama-deepseek", "ollama-duckdb"],
+}
+# Names that used to be imported eagerly from this package
+_CLASSES = {
+    "NaiveProvider": ".naive_provider",
+    "OpenAIProvider": ".openai_provider",
+    "OllamaProvider": ".ollama_provider",
+    "RouterProvider": ".router_provider",
+}
+
+
+def _import(module, name):
+    """The class, or None when its module (or a dependency of it) cannot be imported."""
+    try:
+        return getattr(importlib.import_module(module, __name__), name)
+    except Exception:
+        return None
+
+
+class ProviderRegistry(Mapping):
+    """name -> zero-argument provider factory (None when unavailable; a list for groups).
+
+    Entries are resolved on first access and then cached.
+    """
+
+    def __init__(self):
+        self._resolved = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        if name in _GROUPS:
+            return [self[n] for n in _GROUPS[name]]
+        with self._lock:
+            if name not in self._resolved:
+                module, cls_name, kwargs = _SPECS[name]
+                cls = _import(module, cls_name)
+                self._resolved[name] = partial(cls, **kwargs) if cls is not None and kwargs else cls
+            return self._resolved[name]
+
+    def __iter__(self):
+        return iter(list(_SPECS) + list(_GROUPS))
+
+    def __len__(self):
+        return len(_SPECS) + len(_GROUPS)
+
+
+PROVIDERS = ProviderRegistry()
+
+
+def __getattr__(name):
+    if name in _CLASSES:
+        return _import(_CLASSES[name], name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,105 @@
+import asyncio
+import threading
+import contextvars
+from typing import NamedTuple, Optional
+
+from src.tracing import current_trace
+
+_stats_lock = threading.Lock()
+# Set by hedged races in each generation's context; set() once another provider has won
+_cancel: "contextvars.ContextVar[Optional[threading.Event]]" = contextvars.ContextVar("generation_cancel", default=None)
+
+
+class GenerationCancelled(RuntimeError):
+    """A generation stopped early because its answer is no longer wanted."""
+
+
+def watch_cancel(event: Optional[threading.Event]) -> None:
+    """Generations run later in the current context stop once event is set."""
+    _cancel.set(event)
+
+
+def cancel_event() -> Optional[threading.Event]:
+    return _cancel.get()
+
+
+def cancelled() -> bool:
+    event = _cancel.get()
+    return event is not None and event.is_set()
+
+
+def row_count(rows):
+    """Full result size: RowSet.total when known, otherwise the number of rows held."""
+    total = getattr(rows, "total", None)
+    return len(rows) if total is None else total
+
+
+def count_text(rows) -> str:
+    """row_count() for summaries: "more than N" when rows were cut off uncounted."""
+    if getattr(rows, "total", None) is None and getattr(rows, "truncated", False):
+        return f"more than {len(rows)}"
+    return str(row_count(rows))
+
+
+class GenerationRecord(NamedTuple):
+    """What one generate_sql call cost. Fields a provider cannot report stay None."""
+
+    provider: str
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    ttft_ms: Optional[float] = None
+    # time spent producing completion tokens (wall time minus TTFT when not reported)
+    decode_ms: Optional[float] = None
+    prefill_ms: Optional[float] = None
+    load_ms: Optional[float] = None
+    wall_ms: Optional[float] = None
+    cost_usd: Optional[float] = None
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        ms = self.decode_ms or self.wall_ms
+        if not self.completion_tokens or not ms:
+            return None
+        return self.completion_tokens / (ms / 1000)
+
+    def as_dict(self):
+        return dict(self._asdict(), tokens_per_sec=self.tokens_per_sec)
+
+
 class Provider:
     name = "base"
+    model = None
+    last_record: Optional[GenerationRecord] = None
+
+    def record_generation(self, **fields) -> GenerationRecord:
+        """Build this call's GenerationRecord, keep it as last_record, add its numbers to
+        stats_totals and attach it to the active trace (if any)."""
+        if fields.get("decode_ms") is None and fields.get("wall_ms") is not None and fields.get("ttft_ms") is not None:
+            fields["decode_ms"] = fields["wall_ms"] - fields["ttft_ms"]
+        record = GenerationRecord(provider=self.name, model=self.model, **fields)
+        with _stats_lock:
+            self.last_record = record
+            totals = self.__dict__.setdefault("stats_totals", {"calls": 0})
+            totals["calls"] += 1
+            for key, value in record._asdict().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+        trace = current_trace()
+        if trace is not None:
+            trace.attrs.setdefault("generations", []).append(record.as_dict())
+        return record
 
     def generate_sql(self, question, schema_context):
         raise NotImplementedError
 
+    async def agenerate_sql(self, question, schema_context):
+        """Async generate_sql. The default runs the blocking call in the loop's executor;
+        network providers override it with a native async client."""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()  # keep tracing spans in the caller's trace
+        return await loop.run_in_executor(None, ctx.run, self.generate_sql, question, schema_context)
+
     def summarize(self, question, rows):
-        return f"Found {len(rows)} results"
+        return f"Found {count_text(rows)} results"
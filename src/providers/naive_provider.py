@@ -1,28 +1,66 @@
-from .base import Provider
+from .base import Provider, count_text
+from src.tracing import span
 import re
+import time
+
+# Words that carry no meaning a template could miss
+_FILLER = {
+    "a", "an", "the", "are", "is", "there", "do", "does", "we", "have", "has", "in", "total", "of", "all",
+    "show", "list", "me", "give", "get", "find", "what", "which", "please", "database", "table", "our",
+}
+_COUNT_WORDS = {"how", "many", "count", "number", "total", "tracks", "track", "songs", "song", "albums", "album"}
+_BY_ARTIST_WORDS = {"tracks", "track", "songs", "song", "by", "artist", "band"}
+_TOP_ALBUM_WORDS = {"top", "albums", "album", "by", "with", "most", "track", "tracks", "songs", "count", "number", "5", "five"}
+
+
+def _coverage(q, keywords, value=""):
+    """Share of the question's content words a template accounts for (captured values count)."""
+    words = [w for w in re.findall(r"[a-z0-9_]+", q) if w not in _FILLER]
+    value_words = set(re.findall(r"[a-z0-9_]+", value))
+    if not words:
+        return 0.0
+    return sum(1 for w in words if w in keywords or w in value_words) / len(words)
+
+
+def _parse_tables(schema_context):
+    """{table: [columns]} recovered from describe-style schema text."""
+    tables, current = {}, None
+    for line in schema_context.splitlines():
+        if line.startswith('TABLE '):
+            current = line.split()[1]
+            tables[current] = []
+        elif line.strip().startswith('--') or not line.strip():
+            continue
+        elif line.strip().startswith('FOREIGN KEY'):
+            continue
+        elif line.startswith('  ') and ' ' in line.strip():
+            col = line.strip().split()[0]
+            if current:
+                tables[current].append(col)
+    return tables
+
 
 class NaiveProvider(Provider):
     name = "naive"
 
     def generate_sql(self, question, schema_context):
+        started = time.perf_counter()
+        with span("naive.match"):
+            sql, _ = self.match(question, schema_context)
+        self.record_generation(wall_ms=(time.perf_counter() - started) * 1000, cost_usd=0.0)
+        return sql
+
+    def match(self, question, schema_context):
         """
         Generate SQL using simple pattern matching, but use schema_context to adapt to table/column names.
+
+        Returns (sql, confidence). Confidence is the share of the question the template explains,
+        halved when a table it needs is missing from the schema; the fallback query scores 0.
         """
         q = question.lower()
-        # Parse schema_context for table/column names
-        tables = {}
-        for line in schema_context.splitlines():
-            if line.startswith('TABLE '):
-                current = line.split()[1]
-                tables[current] = []
-            elif line.strip().startswith('--') or not line.strip():
-                continue
-            elif line.strip().startswith('FOREIGN KEY'):
-                continue
-            elif line.startswith('  ') and ' ' in line.strip():
-                col = line.strip().split()[0]
-                if current:
-                    tables[current].append(col)
+        # The chain passes a SchemaText carrying the structured schema; plain text is parsed
+        schema = getattr(schema_context, "schema", None)
+        tables = schema_context.tables if schema is not None else _parse_tables(schema_context)
 
         # Helper to get first table/column by partial name
         def find_table(name):
@@ -36,16 +74,29 @@ class NaiveProvider(Provider):
                     return c
             return None
 
+        def join_on(child, parent, fk_col):
+            # the schema's FK join edge when there is one, else the naming convention
+            for edge in schema.joins(child, parent) if schema is not None else ():
+                return edge.on()
+            return f"{child}.{fk_col} = {parent}.id"
+
+        def known(*names):
+            return 1.0 if all(find_table(n) for n in names) else 0.5
+
         # Patterns
         if "how many" in q and ("tracks" in q or "songs" in q):
             t = find_table("track") or "tracks"
-            return f"SELECT COUNT(*) FROM {t};"
+            return f"SELECT COUNT(*) FROM {t};", _coverage(q, _COUNT_WORDS) * known("track")
         if "how many" in q and "albums" in q:
             t = find_table("album") or "albums"
-            return f"SELECT COUNT(*) FROM {t};"
+            return f"SELECT COUNT(*) FROM {t};", _coverage(q, _COUNT_WORDS) * known("album")
         m = re.search(r"tracks by (artist|band) (.+)", q)
         if m:
             artist = m.group(2).strip(' "\'')
+            # a long "name" usually means extra conditions were swallowed into the LIKE
+            confidence = _coverage(q, _BY_ARTIST_WORDS, artist) * known("track", "album", "artist")
+            if len(artist.split()) > 4:
+                confidence *= 0.5
             t_tracks = find_table("track") or "tracks"
             t_albums = find_table("album") or "albums"
             t_artists = find_table("artist") or "artists"
@@ -56,10 +107,10 @@ class NaiveProvider(Provider):
             c_artist_id = find_col(t_albums, "artist_id") or "artist_id"
             return (
                 f"SELECT {t_tracks}.{c_name}, {t_albums}.{c_title} FROM {t_tracks} "
-                f"JOIN {t_albums} ON {t_tracks}.{c_album_id} = {t_albums}.id "
-                f"JOIN {t_artists} ON {t_albums}.{c_artist_id} = {t_artists}.id "
+                f"JOIN {t_albums} ON {join_on(t_tracks, t_albums, c_album_id)} "
+                f"JOIN {t_artists} ON {join_on(t_albums, t_artists, c_artist_id)} "
                 f"WHERE {t_artists}.{c_artist_name} LIKE '%{artist}%';"
-            )
+            ), confidence
         if "top" in q and "albums" in q and ("track" in q or "songs" in q):
             t_albums = find_table("album") or "albums"
             t_artists = find_table("artist") or "artists"
@@ -71,13 +122,13 @@ class NaiveProvider(Provider):
             c_track_id = find_col(t_tracks, "id") or "id"
             return (
                 f"SELECT {t_albums}.{c_title}, {t_artists}.{c_artist_name}, COUNT({t_tracks}.{c_track_id}) AS track_count "
-                f"FROM {t_albums} JOIN {t_artists} ON {t_albums}.{c_artist_id} = {t_artists}.id "
-                f"LEFT JOIN {t_tracks} ON {t_tracks}.{c_album_id} = {t_albums}.id "
+                f"FROM {t_albums} JOIN {t_artists} ON {join_on(t_albums, t_artists, c_artist_id)} "
+                f"LEFT JOIN {t_tracks} ON {join_on(t_tracks, t_albums, c_album_id)} "
                 f"GROUP BY {t_albums}.id ORDER BY track_count DESC LIMIT 5;"
-            )
+            ), _coverage(q, _TOP_ALBUM_WORDS) * known("album", "artist", "track")
         t_artists = find_table("artist") or "artists"
         c_name = find_col(t_artists, "name") or "name"
-        return f"SELECT {c_name} FROM {t_artists} LIMIT 5;"
+        return f"SELECT {c_name} FROM {t_artists} LIMIT 5;", 0.0
 
     def summarize(self, question, rows):
         q = question.lower()
@@ -86,4 +137,4 @@ class NaiveProvider(Provider):
                 return f"Found {rows[0][0]} items"
         if "top" in q:
             return "Top items: " + ", ".join(f"{r[0]}" for r in rows)
-        return f"Found {len(rows)} results"
+        return f"Found {count_text(rows)} results"
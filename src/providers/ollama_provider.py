@@ -1,12 +1,54 @@
+import os
 import re
-from .base import Provider
-from src.chain.text_to_sql import build_sql_prompt
+import time
+from .base import GenerationCancelled, Provider, cancelled, count_text
+from .sql_stream import StatementScanner
+from src.chain.text_to_sql import build_sql_messages
+from src.tracing import span
+
+# How long Ollama keeps the model (and its KV cache of the prompt prefix) loaded
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
 
 try:
     import ollama
 except Exception:
     ollama = None
 
+
+def _ms(ns):
+    return None if ns is None else ns / 1e6
+
+
+class _Stream:
+    """Accumulates one chat stream and spots the end of the first complete statement."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.parts = []
+        self.final = {}
+        self.ttft_ms = None
+        self.chunks = 0
+        self.scanner = StatementScanner()
+        self.statement = None
+
+    def consume(self, chunk):
+        """Add a chunk; True once the statement is complete and the stream can be closed."""
+        text = chunk.get('message', {}).get('content', '')
+        if chunk.get('done'):
+            self.final = chunk
+        if not text:
+            return False
+        self.chunks += 1
+        self.parts.append(text)
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.started) * 1000
+        self.statement = self.scanner.feed(text)
+        return self.statement is not None
+
+    def content(self):
+        return self.statement if self.statement is not None else "".join(self.parts)
+
+
 class OllamaProvider(Provider):
     def __init__(self, name="ollama", model=None):
         self.name = name
@@ -16,34 +58,112 @@ class OllamaProvider(Provider):
             raise RuntimeError(f"Ollama provider '{name}': model must be specified explicitly!")
         self.model = model
 
+    @property
+    def aclient(self):
+        """ollama.AsyncClient, created on first async use (honours OLLAMA_HOST)."""
+        if getattr(self, "_aclient", None) is None:
+            self._aclient = ollama.AsyncClient()
+        return self._aclient
+
+    def _request(self, question, schema_context):
+        # system message = stable schema/instructions prefix, so the loaded model reuses its KV cache
+        return dict(
+            model=self.model,
+            messages=build_sql_messages(schema_context, question),
+            stream=True,
+            options={"temperature": 0, "num_predict": 64},
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+
     def generate_sql(self, question, schema_context):
-        prompt = build_sql_prompt(schema_context, question)
         if ollama is None:
             raise RuntimeError(f"Ollama provider '{self.name}': ollama package is not installed or failed to import.")
         try:
-            stream = ollama.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
-                options={"temperature": 0, "num_predict": 64},
-            )
-            content = "".join(chunk.get('message', {}).get('content', '') for chunk in stream).strip()
-            fence_match = re.search(r"```(?:sql)?\\s*(.*?)```", content, re.DOTALL | re.IGNORECASE)
-            if fence_match:
-                content = fence_match.group(1).strip()
-            if content.lower().startswith("sql:"):
-                content = content.split(":", 1)[1].strip()
-            select_match = re.search(r"(?is)(select\\s.+)", content)
-            if select_match:
-                content = select_match.group(1).strip()
-            content = content.strip()
-            if not content.endswith(";"):
-                content += ";"
-            if not content:
-                raise RuntimeError(f"Ollama provider '{self.name}': empty content")
-            return content
+            stream = _Stream()
+            request = self._request(question, schema_context)
+            with span("ollama.chat") as s:
+                chunks = ollama.chat(**request)
+                try:
+                    for chunk in chunks:
+                        if cancelled():
+                            raise GenerationCancelled("another provider answered first")
+                        if stream.consume(chunk):
+                            break
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close:
+                        close()  # drops the HTTP stream, so Ollama stops generating
+                s.set(ttft_ms=stream.ttft_ms, stopped_early=stream.statement is not None)
+            self._record(stream)
+            return self._extract_sql(stream.content())
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Ollama provider '{self.name}': {e}")
+
+    async def agenerate_sql(self, question, schema_context):
+        if ollama is None:
+            raise RuntimeError(f"Ollama provider '{self.name}': ollama package is not installed or failed to import.")
+        try:
+            stream = _Stream()
+            request = self._request(question, schema_context)
+            with span("ollama.chat") as s:
+                chunks = await self.aclient.chat(**request)
+                try:
+                    async for chunk in chunks:
+                        if stream.consume(chunk):
+                            break
+                finally:
+                    aclose = getattr(chunks, "aclose", None)
+                    if aclose:
+                        await aclose()
+                s.set(ttft_ms=stream.ttft_ms, stopped_early=stream.statement is not None)
+            self._record(stream)
+            return self._extract_sql(stream.content())
+        except GenerationCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Ollama provider '{self.name}': {e}")
 
+    def _record(self, stream):
+        """Token counts and timings from the final stream chunk (Ollama durations are in ns).
+        A reused prefix shows up as a small prompt_eval_count / prompt_eval_duration; local
+        models cost nothing per token.
+
+        Stopping the stream at the end of the statement gives up the final chunk, so its
+        prompt token count, prefill and load times stay None (unknown, not zero: zero would
+        read as a perfect prefix-cache hit); ttft_ms still measures them together from the
+        client side. Completion tokens are then counted as chunks received (Ollama streams
+        about one token each)."""
+        final = stream.final
+        eval_ns = final.get('eval_duration')
+        self.record_generation(
+            prompt_tokens=final.get('prompt_eval_count'),
+            completion_tokens=final.get('eval_count', stream.chunks if stream.statement is not None else None),
+            prefill_ms=_ms(final.get('prompt_eval_duration')),
+            load_ms=_ms(final.get('load_duration')),
+            decode_ms=eval_ns / 1e6 if eval_ns else None,
+            ttft_ms=stream.ttft_ms,
+            wall_ms=(time.perf_counter() - stream.started) * 1000,
+            cost_usd=0.0,
+        )
+
+    def _extract_sql(self, content):
+        content = content.strip()
+        fence_match = re.search(r"```(?:sql)?\\s*(.*?)```", content, re.DOTALL | re.IGNORECASE)
+        if fence_match:
+            content = fence_match.group(1).strip()
+        if content.lower().startswith("sql:"):
+            content = content.split(":", 1)[1].strip()
+        select_match = re.search(r"(?is)(select\\s.+)", content)
+        if select_match:
+            content = select_match.group(1).strip()
+        content = content.strip()
+        if not content.endswith(";"):
+            content += ";"
+        if not content:
+            raise RuntimeError(f"Ollama provider '{self.name}': empty content")
+        return content
+
     def summarize(self, question, rows):
-        return f"Found {len(rows)} results for: {question}"
+        return f"Found {count_text(rows)} results for: {question}"
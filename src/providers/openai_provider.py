@@ -1,11 +1,71 @@
 import os
-from .base import Provider
-from src.chain.text_to_sql import build_sql_prompt
+import time
+import asyncio
+import random
+import threading
+from .base import GenerationCancelled, Provider, cancel_event, cancelled, count_text
+from src.chain.text_to_sql import build_sql_messages
+from src.tracing import span
 
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
 except Exception:
-    OpenAI = None
+    OpenAI = AsyncOpenAI = None
+
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 5))
+# USD per million tokens (defaults: gpt-4o-mini list prices); cached prompt tokens bill at the cached rate
+OPENAI_PRICE_INPUT = float(os.environ.get("OPENAI_PRICE_INPUT", 0.15))
+OPENAI_PRICE_CACHED_INPUT = float(os.environ.get("OPENAI_PRICE_CACHED_INPUT", 0.075))
+OPENAI_PRICE_OUTPUT = float(os.environ.get("OPENAI_PRICE_OUTPUT", 0.60))
+# Cut the completion right after the statement: a trailing comment, explanation or second
+# statement. The API drops the matched stop text, so _content restores the ';'.
+OPENAI_STOP = [";\n", "; ", ";--", "\n\n"]
+
+# Shared across threads: once any worker hits a 429, every worker waits out the cooldown
+_cooldown_lock = threading.Lock()
+_cooldown_until = 0.0
+
+
+def _retry_after(exc):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_rate_limited(exc):
+    msg = str(exc).lower()
+    if "insufficient_quota" in msg or ("quota" in msg and "exceeded" in msg):
+        return False  # quota exhaustion does not recover by waiting
+    return getattr(exc, "status_code", None) == 429 or "rate_limit" in msg or "rate limit" in msg
+
+
+def _wait_for_cooldown():
+    delay = _cooldown_until - time.monotonic()
+    if delay > 0:
+        event = cancel_event()
+        # a hedged generation stops waiting as soon as another provider has won
+        event.wait(delay) if event is not None else time.sleep(delay)
+
+
+async def _await_cooldown():
+    delay = _cooldown_until - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _backoff_delay(exc, attempt):
+    return _retry_after(exc) or min(30.0, 2 ** attempt) * (1 + random.random() / 2)
+
+
+def _start_cooldown(seconds):
+    global _cooldown_until
+    with _cooldown_lock:
+        _cooldown_until = max(_cooldown_until, time.monotonic() + seconds)
+
 
 class OpenAIProvider(Provider):
     name = "openai"
@@ -16,32 +76,117 @@ class OpenAIProvider(Provider):
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OpenAI provider: OPENAI_API_KEY not set.")
-        self.client = OpenAI(api_key=api_key)
+        # retries are handled here so 429 backoff is shared across worker threads
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+        self._api_key = api_key
+        self._aclient = None
         self.model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
+    @property
+    def aclient(self):
+        """AsyncOpenAI client, created on first async use."""
+        if self._aclient is None:
+            self._aclient = AsyncOpenAI(api_key=self._api_key, max_retries=0)
+        return self._aclient
+
+    def _request(self, messages):
+        # stable system prefix first: OpenAI caches repeated prompt prefixes (>= 1024 tokens)
+        return dict(
+            model=self.model,
+            messages=messages,
+            temperature=0,
+            max_tokens=100,
+            stop=OPENAI_STOP,
+            timeout=30,
+        )
+
     def generate_sql(self, question, schema_context):
-        prompt = build_sql_prompt(schema_context, question)
+        messages = build_sql_messages(schema_context, question)
+        try:
+            started = time.perf_counter()
+            resp = self._create_with_backoff(messages)
+            self._record(resp, started)
+            return self._content(resp)
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            raise self._error(e)
+
+    async def agenerate_sql(self, question, schema_context):
+        messages = build_sql_messages(schema_context, question)
         try:
-            resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=100,
-                timeout=30,
-            )
-            content = resp.choices[0].message.content.strip()
-            if not content:
-                raise RuntimeError("OpenAI provider: API returned empty content.")
-            return content
+            started = time.perf_counter()
+            resp = await self._acreate_with_backoff(messages)
+            self._record(resp, started)
+            return self._content(resp)
         except Exception as e:
-            msg = str(e).lower()
-            if any(x in msg for x in ["quota", "rate_limit"]):
-                raise RuntimeError("OpenAI provider: quota/rate limit error.")
-            if "401" in msg or "unauthorized" in msg:
-                raise RuntimeError("OpenAI provider: unauthorized.")
-            if "timeout" in msg:
-                raise RuntimeError("OpenAI provider: timeout.")
-            raise RuntimeError(f"OpenAI provider: {msg}")
+            raise self._error(e)
+
+    def _record(self, resp, started):
+        """Token usage and cost of one completion. Responses are not streamed, so TTFT is
+        unknown and tokens/sec is end-to-end (completion tokens over wall time)."""
+        usage = getattr(resp, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        cost = None
+        if prompt is not None and completion is not None:
+            cost = ((prompt - cached) * OPENAI_PRICE_INPUT + cached * OPENAI_PRICE_CACHED_INPUT + completion * OPENAI_PRICE_OUTPUT) / 1e6
+        self.record_generation(
+            prompt_tokens=prompt,
+            completion_tokens=completion,
+            cached_tokens=cached,
+            wall_ms=(time.perf_counter() - started) * 1000,
+            cost_usd=cost,
+        )
+
+    @staticmethod
+    def _content(resp):
+        choice = resp.choices[0]
+        content = choice.message.content.strip()
+        if not content:
+            raise RuntimeError("OpenAI provider: API returned empty content.")
+        if getattr(choice, "finish_reason", None) == "stop" and not content.endswith(";"):
+            content += ";"
+        return content
+
+    @staticmethod
+    def _error(e):
+        msg = str(e).lower()
+        if any(x in msg for x in ["quota", "rate_limit"]):
+            return RuntimeError("OpenAI provider: quota/rate limit error.")
+        if "401" in msg or "unauthorized" in msg:
+            return RuntimeError("OpenAI provider: unauthorized.")
+        if "timeout" in msg:
+            return RuntimeError("OpenAI provider: timeout.")
+        return RuntimeError(f"OpenAI provider: {msg}")
+
+    def _create_with_backoff(self, messages):
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            with span("openai.cooldown"):
+                _wait_for_cooldown()
+            if cancelled():
+                raise GenerationCancelled("another provider answered first")
+            try:
+                with span("openai.request", attempt=attempt):
+                    return self.client.chat.completions.create(**self._request(messages))
+            except Exception as e:
+                if attempt == OPENAI_MAX_RETRIES or not _is_rate_limited(e):
+                    raise
+                _start_cooldown(_backoff_delay(e, attempt))
+
+    async def _acreate_with_backoff(self, messages):
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            with span("openai.cooldown"):
+                await _await_cooldown()
+            try:
+                with span("openai.request", attempt=attempt):
+                    return await self.aclient.chat.completions.create(**self._request(messages))
+            except Exception as e:
+                if attempt == OPENAI_MAX_RETRIES or not _is_rate_limited(e):
+                    raise
+                _start_cooldown(_backoff_delay(e, attempt))
 
     def summarize(self, question, rows):
-        return f"Found {len(rows)} results for: {question}"
+        return f"Found {count_text(rows)} results for: {question}"
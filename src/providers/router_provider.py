@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from .base import Provider
+from .naive_provider import NaiveProvider
+from src.tracing import current_trace, span
+
+# LLM provider the router escalates to, and the template confidence needed to skip it
+ROUTER_LLM = os.environ.get("ROUTER_LLM", "ollama")
+ROUTER_MIN_CONFIDENCE = float(os.environ.get("ROUTER_MIN_CONFIDENCE", 0.8))
+# Questions whose answering tier is remembered so summarize() asks the same tier
+_REMEMBER = 1024
+
+
+class RouterProvider(Provider):
+    """Tiered generation: NaiveProvider's templates answer when one matches confidently,
+    anything else escalates to the configured LLM provider.
+
+    Each call is counted in tier_stats ({tier: {calls, errors, ms}}) and appended to the
+    active trace's "tiers" list as {tier, confidence, ms, ok}; an escalation that raises
+    is still counted, as an error.
+    """
+
+    def __init__(self, llm=None, min_confidence=None, name=None):
+        self.llm_name = llm or ROUTER_LLM
+        self.name = name or f"router-{self.llm_name}"
+        self.min_confidence = ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.templates = NaiveProvider()
+        self.tier_stats = {}
+        self._stats_lock = threading.Lock()
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        self._tiers = OrderedDict()
+
+    def llm(self):
+        """The escalation provider, created on first use so template hits never need it."""
+        with self._llm_lock:
+            if self._llm is None:
+                from src.providers import PROVIDERS
+                ProviderCls = PROVIDERS.get(self.llm_name)
+                if not ProviderCls or isinstance(ProviderCls, list):
+                    raise RuntimeError(f"Router LLM provider '{self.llm_name}' not available.")
+                self._llm = ProviderCls()
+            return self._llm
+
+    def _template(self, question, schema_context):
+        # the chain appends "# ..." hint lines; a retry hint means the template's SQL already failed
+        asked, _, hints = question.partition("\n#")
+        if "Previous SQL" in hints:
+            return asked, None, 0.0
+        with span("route.template") as s:
+            sql, confidence = self.templates.match(asked, schema_context)
+            s.set(confidence=round(confidence, 3))
+        return asked, sql if confidence >= self.min_confidence else None, confidence
+
+    def _record(self, asked, tier, confidence, started, ok=True):
+        ms = (time.perf_counter() - started) * 1000
+        if tier == "template":
+            self.record_generation(wall_ms=ms, cost_usd=0.0)
+        with self._stats_lock:
+            stats = self.tier_stats.setdefault(tier, {"calls": 0, "errors": 0, "ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += not ok
+            stats["ms"] += ms
+            self._tiers[asked] = tier
+            self._tiers.move_to_end(asked)
+            while len(self._tiers) > _REMEMBER:
+                self._tiers.popitem(last=False)
+        trace = current_trace()
+        if trace is not None:
+            trace.attrs.setdefault("tiers", []).append(dict(tier=tier, confidence=round(confidence, 3), ms=ms, ok=ok))
+
+    def generate_sql(self, question, schema_context):
+        started = time.perf_counter()
+        asked, sql, confidence = self._template(question, schema_context)
+        if sql is not None:
+            self._record(asked, "template", confidence, started)
+            return sql
+        ok = False
+        try:
+            with span("route.llm"):
+                sql = self.llm().generate_sql(question, schema_context)
+            ok = True
+        finally:
+            self._record(asked, "llm", confidence, started, ok)
+        return sql
+
+    async def agenerate_sql(self, question, schema_context):
+        started = time.perf_counter()
+        asked, sql, confidence = self._template(question, schema_context)
+        if sql is not None:
+            self._record(asked, "template", confidence, started)
+            return sql
+        ok = False
+        try:
+            with span("route.llm"):
+                sql = await self.llm().agenerate_sql(question, schema_context)
+            ok = True
+        finally:
+            self._record(asked, "llm", confidence, started, ok)
+        return sql
+
+    def summarize(self, question, rows):
+        with self._stats_lock:
+            tier = self._tiers.get(question)
+        if tier == "llm":
+            return self.llm().summarize(question, rows)
+        return self.templates.summarize(question, rows)
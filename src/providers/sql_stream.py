@@ -0,0 +1,64 @@
+import re
+from typing import Optional
+
+# A statement starts with SELECT/WITH at the start of a line (optionally after a fence or
+# "SQL:"), so prose like "I'll select the tracks" is not mistaken for SQL.
+_START = re.compile(r"(?im)^[ \t]*(?:```(?:sql)?[ \t]*\n?[ \t]*)?(?:sql:[ \t]*)?((?:select|with)\b)")
+
+
+class StatementScanner:
+    """Incrementally finds the first complete SQL statement in streamed model output.
+
+    Text is fed chunk by chunk; feed() returns the statement (through its terminating
+    ';') once a ';' arrives outside quotes, comments and parentheses, else None. Scanning
+    resumes where the previous chunk stopped, so the whole stream is read once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.start: Optional[int] = None
+        self.pos = 0
+        self.quote: Optional[str] = None  # ', ", ` or ] while inside a quoted token
+        self.comment: Optional[str] = None  # "--" or "/*"
+        self.depth = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        if self.start is None:
+            m = _START.search(self.text)
+            if not m:
+                return None
+            self.start = self.pos = m.start(1)
+        text, i = self.text, self.pos
+        # stop one char short so two-char tokens ('' escapes, --, /*, */) are seen whole
+        while i < len(text) - 1 or (i < len(text) and text[i] == ";"):
+            c = text[i]
+            if self.comment == "--":
+                if c == "\n":
+                    self.comment = None
+            elif self.comment == "/*":
+                if text.startswith("*/", i):
+                    self.comment = None
+                    i += 1
+            elif self.quote:
+                if c == self.quote:
+                    if c != "]" and text[i + 1:i + 2] == c:
+                        i += 1  # doubled quote is an escaped quote
+                    else:
+                        self.quote = None
+            elif c in "'\"`":
+                self.quote = c
+            elif c == "[":
+                self.quote = "]"
+            elif text.startswith("--", i) or text.startswith("/*", i):
+                self.comment = text[i:i + 2]
+                i += 1
+            elif c == "(":
+                self.depth += 1
+            elif c == ")":
+                self.depth = max(0, self.depth - 1)
+            elif c == ";" and self.depth == 0:
+                return text[self.start:i + 1]
+            i += 1
+        self.pos = i
+        return None
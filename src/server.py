@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from dotenv import load_dotenv
+
+# src modules (and the SERVER_* defaults below) read their settings at import
+load_dotenv()
+
+from src.chain.text_to_sql import TextToSQLChain
+from src.db.sqlite_db import DEFAULT_MAX_ROWS, QueryTimeout, close_all_pools
+from src.feedback import get_store, log_feedback
+from src.tracing import TRACE_PATH, export_jsonl, trace
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 8000))
+# Requests answered at once, and requests allowed to wait for a worker before new ones get 503
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 8))
+SERVER_QUEUE = int(os.environ.get("SERVER_QUEUE", 32))
+MAX_BODY_BYTES = 1 << 20
+# How long the accept loop waits for a free slot before answering 503
+ADMIT_WAIT = 0.05
+
+_BUSY = json.dumps({"error": "server_busy", "message": "too many requests in flight, retry shortly"}).encode("utf-8")
+
+
+class ServerError(Exception):
+    def __init__(self, status, error, message):
+        super().__init__(message)
+        self.status, self.error = status, error
+
+
+def error_status(exc):
+    """(HTTP status, error code) for an exception raised while answering a question."""
+    msg = str(exc)
+    if isinstance(exc, QueryTimeout):
+        return 504, "query_too_expensive" if "query_too_expensive" in msg else "query_timeout"
+    if "not available" in msg:
+        return 503, "provider_unavailable"
+    if "validation_failed" in msg:
+        return 422, "validation_failed"
+    return 500, "internal_error"
+
+
+def hedge_options(body):
+    """(provider names or None, hedge_delay) from a request body's "hedge"/"hedge_delay"."""
+    hedge, delay = body.get("hedge"), body.get("hedge_delay")
+    if hedge is None:
+        return None, None
+    if not isinstance(hedge, list) or not hedge or not all(isinstance(p, str) and p for p in hedge):
+        raise ServerError(400, "bad_request", "'hedge' must be a non-empty list of provider names")
+    if delay not in (None, "p95") and (isinstance(delay, bool) or not isinstance(delay, (int, float)) or delay < 0):
+        raise ServerError(400, "bad_request", "'hedge_delay' must be a number of seconds or 'p95'")
+    return hedge, delay
+
+
+class TextToSQLServer(HTTPServer):
+    """HTTP server answering from one warmed TextToSQLChain.
+
+    Requests run on a fixed pool of worker threads, so each worker's pooled SQLite
+    connection, the schema/linker/few-shot caches and the provider clients stay hot
+    between requests. At most workers + queue requests are accepted at once; beyond that
+    the accept loop answers 503 immediately instead of queuing without bound.
+    """
+
+    def __init__(self, address, chain, provider="naive", db_path=None, workers=SERVER_WORKERS, queue=SERVER_QUEUE):
+        # the accept backlog must hold every connection we may still admit (socketserver's default is 5)
+        self.request_queue_size = max(128, workers + queue)
+        super().__init__(address, Handler)
+        self.chain, self.provider, self.db_path = chain, provider, db_path
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="t2s-worker")
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.started = time.time()
+        self.draining = False
+        self.stats_lock = threading.Lock()
+        self.stats = dict(in_flight=0, served=0, rejected=0, errors=0)
+
+    def _count(self, key, delta=1):
+        with self.stats_lock:
+            self.stats[key] += delta
+
+    def process_request(self, request, client_address):
+        if self.draining or not self.slots.acquire(timeout=ADMIT_WAIT):
+            self._count("rejected")
+            try:
+                # read the request first: closing with unread data resets the connection before the 503 arrives
+                request.settimeout(ADMIT_WAIT)
+                request.recv(65536)
+                request.sendall(
+                    b"HTTP/1.0 503 Service Unavailable\r\nContent-Type: application/json\r\nRetry-After: 1\r\n"
+                    + f"Content-Length: {len(_BUSY)}\r\n\r\n".encode("ascii") + _BUSY
+                )
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        self._count("in_flight")
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            # free the slot first: the client may send its next request as soon as it has the response
+            self._count("in_flight", -1)
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def drain(self):
+        """Stop accepting, let in-flight requests finish, then release pooled resources."""
+        self.draining = True
+        self.shutdown()
+        self.pool.shutdown(wait=True)
+        self.server_close()
+        close_all_pools()
+        get_store().close()
+
+    def health(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return dict(
+            status="draining" if self.draining else "ok",
+            uptime_s=round(time.time() - self.started, 1),
+            provider=self.provider,
+            generation_cache=self.chain.cache_stats(),
+            **stats,
+        )
+
+    def query(self, body):
+        question = body.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ServerError(400, "bad_request", "'question' (non-empty string) is required")
+        provider = body.get("provider") or self.provider
+        try:
+            options = dict(
+                db_path=self.db_path, max_rows=int(body.get("max_rows", DEFAULT_MAX_ROWS)),
+                timeout=None if body.get("timeout") is None else float(body["timeout"]),
+                max_steps=None if body.get("max_steps") is None else int(body["max_steps"]),
+            )
+        except (TypeError, ValueError) as e:
+            raise ServerError(400, "bad_request", f"invalid option: {e}")
+        hedge, hedge_delay = hedge_options(body)
+        with trace(question=question, provider=provider) as t:
+            try:
+                if hedge:
+                    sql, rows, summary, provider = self.chain.run_hedged(question, hedge, hedge_delay=hedge_delay, **options)
+                else:
+                    sql, rows, summary = self.chain.run(question, provider_name=provider, **options)
+            except Exception as e:
+                status, error = error_status(e)
+                raise ServerError(status, error, str(e)) from e
+        if TRACE_PATH:
+            export_jsonl([t], TRACE_PATH)
+        return dict(
+            sql=sql, provider=provider, rows=[list(r) for r in rows], truncated=rows.truncated,
+            limited=rows.limited, total=rows.total, summary=summary,
+            timings_ms={k: round(v, 3) for k, v in dict(t.stage_ms(), total=t.wall_ms).items()},
+        )
+
+    def feedback(self, body):
+        if not body.get("question") or not (body.get("feedback") or body.get("correction")):
+            raise ServerError(400, "bad_request", "'question' and 'feedback' (up|down) or 'correction' are required")
+        if body.get("feedback") not in (None, "up", "down"):
+            raise ServerError(400, "bad_request", "'feedback' must be 'up' or 'down'")
+        provider = body.get("provider") or self.provider
+        hedge, _ = hedge_options(body)
+        log_feedback(
+            question=body["question"], provider=provider, sql=body.get("sql") or "",
+            rows=int(body.get("rows") or 0), summary=body.get("summary") or "",
+            feedback=body.get("feedback"), correction=body.get("correction"),
+        )
+        if body.get("feedback") == "down" or body.get("correction"):
+            # a rejected answer must not keep being served from the generation cache
+            self.chain.forget(body["question"], hedge or provider, correction=body.get("correction"), db_path=self.db_path)
+        return dict(logged=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: TextToSQLServer
+    server_version = "TextToSQL/1.0"
+    quiet = False
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ServerError(413, "payload_too_large", f"body exceeds {MAX_BODY_BYTES} bytes")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise ServerError(400, "bad_request", f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ServerError(400, "bad_request", "body must be a JSON object")
+        return body
+
+    def _dispatch(self, routes):
+        route = routes.get(self.path.split("?", 1)[0])
+        if route is None:
+            self._send(404, {"error": "not_found", "message": f"no route for {self.command} {self.path}"})
+            return
+        try:
+            self._send(200, route())
+        except ServerError as e:
+            if e.status >= 500:
+                self.server._count("errors")
+            self._send(e.status, {"error": e.error, "message": str(e)})
+        except Exception as e:
+            self.server._count("errors")
+            self._send(500, {"error": "internal_error", "message": str(e)})
+        else:
+            self.server._count("served")
+
+    def do_GET(self):
+        self._dispatch({"/health": self.server.health})
+
+    def do_POST(self):
+        self._dispatch({
+            "/query": lambda: self.server.query(self._body()),
+            "/feedback": lambda: self.server.feedback(self._body()),
+        })
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Text-to-SQL over HTTP from a warm process")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--provider", default="naive", help="Default provider for /query")
+    parser.add_argument("--warm", nargs="*", default=[], metavar="PROVIDER", help="Extra providers to load at startup")
+    parser.add_argument("--db-path", dest="db_path", help="SQLite DB path (default SQLITE_DB_PATH)")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Requests answered concurrently")
+    parser.add_argument("--queue", type=int, default=SERVER_QUEUE, help="Requests waiting for a worker before 503s")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    args = parser.parse_args()
+
+    chain = TextToSQLChain()
+    started = time.perf_counter()
+    chain.warm([args.provider] + args.warm, db_path=args.db_path)
+    Handler.quiet = args.quiet
+    server = TextToSQLServer((args.host, args.port), chain, args.provider, args.db_path, args.workers, args.queue)
+
+    drainer = threading.Thread(target=server.drain, name="t2s-drain")
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever(), which runs in this (the signal-handling) thread
+        if not drainer.is_alive() and not server.draining:
+            drainer.start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Warmed up in {(time.perf_counter() - started) * 1000:.0f} ms; serving on http://{args.host}:{server.server_port} "
+          f"({args.workers} workers, queue {args.queue}, provider {args.provider})")
+    server.serve_forever()
+    print("Draining in-flight requests...")
+    drainer.join()
+    print("Stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Append every finished chain trace to this JSONL file (also turns tracing on)
+TRACE_PATH = os.environ.get("TRACE_PATH", "")
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "").lower() in ("1", "true", "yes") or bool(TRACE_PATH)
+PERCENTILES = (50, 95, 99)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Spans recorded while answering one request: (name, offset ms, duration ms, attrs)."""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.wall_ms: Optional[float] = None
+        self.spans: List[tuple] = []
+
+    def add(self, name: str, start: float, end: float, attrs: Optional[Dict] = None) -> None:
+        self.spans.append((name, (start - self.started) * 1000, (end - start) * 1000, attrs))
+
+    def stage_ms(self) -> Dict[str, float]:
+        """Total milliseconds per span name (a stage can run more than once, e.g. retries)."""
+        out: Dict[str, float] = {}
+        for name, _, ms, _ in self.spans:
+            out[name] = out.get(name, 0.0) + ms
+        return out
+
+    def to_dict(self) -> Dict:
+        return dict(
+            attrs=self.attrs,
+            wall_ms=self.wall_ms,
+            spans=[dict(name=n, offset_ms=round(o, 3), ms=round(ms, 3), **(a or {})) for n, o, ms, a in self.spans],
+        )
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "start")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict):
+        self.trace, self.name, self.attrs = trace, name, attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter(), self.attrs or None)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """Time a block as a stage of the active trace; a shared no-op when none is active."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, attrs)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace(**attrs) -> Iterator[Trace]:
+    """Record spans from this thread/task into a new Trace until the block exits."""
+    t = Trace(**attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        t.wall_ms = (time.perf_counter() - t.started) * 1000
+
+
+def export_jsonl(traces: Iterable[Trace], path: str) -> None:
+    """Append traces to a JSONL file, one trace per line."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = "".join(json.dumps(t.to_dict(), default=str) + "\n" for t in traces)
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def stage_percentiles(stage_timings: Iterable[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """{stage: {count, p50, p95, p99}} in ms from per-request stage_ms() dicts."""
+    by_stage: Dict[str, List[float]] = {}
+    for timings in stage_timings:
+        for name, ms in (timings or {}).items():
+            by_stage.setdefault(name, []).append(ms)
+    out = {}
+    for name, values in by_stage.items():
+        values.sort()
+        out[name] = dict(count=len(values), **{f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES})
+    return out
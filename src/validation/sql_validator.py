@@ -1,26 +1,102 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Set, Tuple, Union
+
 import sqlglot
 import sqlglot.expressions as exp
 
+from src.db.schema import SchemaInfo
+
 ALLOWED_STATEMENTS = {exp.Select, exp.Union, exp.With}
 
+SQL_AST_CACHE_SIZE = int(os.environ.get("SQL_AST_CACHE_SIZE", 4096))
+COLUMN_INDEX_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=SQL_AST_CACHE_SIZE)
+def parse_sql(sql: str) -> exp.Expression:
+    """Parse sql (SQLite dialect) once; later calls with the same text reuse the AST.
+
+    The AST is shared between callers and threads: treat it as read-only, or .copy()
+    it before transforming. Parse errors are raised (and not cached).
+    """
+    return sqlglot.parse_one(sql, dialect="sqlite")
+
+
+class ColumnIndex:
+    """Table names and qualified "table.column" names of one schema, built once."""
+
+    __slots__ = ("tables", "columns")
+
+    def __init__(self, tables: Dict[str, Set[str]]):
+        self.tables = frozenset(tables)
+        self.columns = frozenset(f"{t}.{c}" for t, cols in tables.items() for c in cols)
 
-def validate_sql(sql, tables):
-    try:
-        parsed = sqlglot.parse_one(sql, dialect="sqlite")
-    except Exception as e:
-        return False, f"parse error: {e}"
+
+_INDEXES: "OrderedDict[int, Tuple[Dict, ColumnIndex]]" = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+def column_index(tables: Dict[str, Set[str]]) -> ColumnIndex:
+    """ColumnIndex for a {table: columns} dict, memoized for this exact dict object
+    (a SchemaInfo carries its own lookup sets)."""
+    key = id(tables)
+    with _INDEXES_LOCK:
+        entry = _INDEXES.get(key)
+        if entry is not None and entry[0] is tables:
+            _INDEXES.move_to_end(key)
+            return entry[1]
+    index = ColumnIndex(tables)
+    with _INDEXES_LOCK:
+        # keep tables referenced so an id() key cannot be reused by another dict
+        _INDEXES[key] = (tables, index)
+        while len(_INDEXES) > COLUMN_INDEX_CACHE_SIZE:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def validate_sql(sql: Union[str, exp.Expression], tables):
+    """(ok, message) for sql (text or an AST from parse_sql) against a SchemaInfo, whose
+    lookup sets are used directly, or a {table: columns} dict."""
+    if isinstance(sql, exp.Expression):
+        parsed = sql
+    else:
+        try:
+            parsed = parse_sql(sql)
+        except Exception as e:
+            return False, f"parse error: {e}"
     if not isinstance(parsed, tuple(ALLOWED_STATEMENTS)):
         return False, "not a SELECT/UNION/CTE statement"
-    tables_set = set(tables)
+    if isinstance(tables, SchemaInfo):
+        names, qualified = tables.tables, tables.qualified
+    else:
+        index = column_index(tables)
+        names, qualified = index.tables, index.columns
     for table in parsed.find_all(exp.Table):
-        if table.name not in tables_set:
+        if table.name not in names:
             return False, f"unknown table: {table.name}"
-    known_cols = {f"{t}.{c}" for t, cols in tables.items() for c in cols}
     for col in parsed.find_all(exp.Column):
-        if col.table and col.name and f"{col.table}.{col.name}" not in known_cols:
+        if col.table and col.name and f"{col.table}.{col.name}" not in qualified:
             return False, f"unknown column: {col.table}.{col.name}"
     return True, "ok"
 
 
-def normalize_sql(sql):
-    return sqlglot.transpile(sql, read="sqlite", write="sqlite", normalize=True, pretty=False)[0]
+@lru_cache(maxsize=SQL_AST_CACHE_SIZE)
+def _normalized(sql: str) -> str:
+    return parse_sql(sql).sql(dialect="sqlite", normalize=True, pretty=False)
+
+
+def normalize_sql(sql: Union[str, exp.Expression]) -> str:
+    """Canonical SQLite spelling of sql (text or an AST), used for EM scoring and cache keys."""
+    if isinstance(sql, exp.Expression):
+        return sql.sql(dialect="sqlite", normalize=True, pretty=False)
+    return _normalized(sql)
+
+
+def clear_sql_caches() -> None:
+    parse_sql.cache_clear()
+    _normalized.cache_clear()
+    with _INDEXES_LOCK:
+        _INDEXES.clear()